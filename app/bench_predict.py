@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""Micro-benchmark of the XGBoost inference backends (services/xgb_backends.py).
+
+    python bench_predict.py                 # served model, or a synthetic one if none
+    python bench_predict.py --synthetic --rows 1 24 1000 --repeat 2000
+"""
+import argparse
+import time
+import numpy as np
+from xgboost import XGBRegressor
+from services.model_xgb import load_model
+from services.xgb_backends import BACKENDS, build_predictor
+
+
+def _synthetic_model(n_features: int = 5) -> XGBRegressor:
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(20_000, n_features))
+    y = X @ rng.normal(size=n_features) + rng.normal(scale=0.1, size=len(X))
+    model = XGBRegressor(n_estimators=300, max_depth=6, learning_rate=0.08, tree_method="hist", n_jobs=4)
+    model.fit(X, y)
+    return model
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 24, 1000], help="Rows per predict call")
+    parser.add_argument("--repeat", type=int, default=1000, help="Timed calls per backend and batch size")
+    parser.add_argument("--synthetic", action="store_true", help="Ignore the served model")
+    args = parser.parse_args()
+
+    model = None if args.synthetic else load_model()
+    source = "served"
+    if model is None:
+        model, source = _synthetic_model(), "synthetic"
+    n_features = int(model.n_features_in_)
+    rng = np.random.default_rng(1)
+    print(f"model: {source}, {n_features} features, {model.get_booster().num_boosted_rounds()} trees")
+    print(f"{'backend':<10}{'rows':>6}{'p50 us':>12}{'p99 us':>12}{'us/row':>10}{'max |diff|':>14}")
+    reference = build_predictor(model, "sklearn")
+    for backend in BACKENDS:
+        try:
+            predict = build_predictor(model, backend)
+        except Exception as e:
+            print(f"{backend:<10} unavailable: {e}")
+            continue
+        for rows in args.rows:
+            X = rng.normal(size=(rows, n_features))
+            diff = float(np.max(np.abs(predict(X) - reference(X))))
+            for _ in range(10):
+                predict(X)
+            times = np.empty(args.repeat)
+            for i in range(args.repeat):
+                start = time.perf_counter()
+                predict(X)
+                times[i] = time.perf_counter() - start
+            p50, p99 = np.percentile(times, [50, 99]) * 1e6
+            print(f"{backend:<10}{rows:>6}{p50:>12.1f}{p99:>12.1f}{p50 / rows:>10.2f}{diff:>14.2e}")
+
+
+if __name__ == "__main__":
+    main()
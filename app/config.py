@@ -22,6 +22,77 @@ class Settings(BaseSettings):
     tempo_version_standard: str = Field(default="V04", alias="TEMPO_VERSION_STANDARD")
     tempo_version_nrt: str = Field(default="V02", alias="TEMPO_VERSION_NRT")
 
+    # Ingestion
+    http_max_connections: int = Field(default=20, alias="HTTP_MAX_CONNECTIONS")
+    openaq_concurrency: int = Field(default=4, alias="OPENAQ_CONCURRENCY")
+    airnow_concurrency: int = Field(default=8, alias="AIRNOW_CONCURRENCY")
+    http_max_retries: int = Field(default=3, alias="HTTP_MAX_RETRIES")
+    http_backoff_seconds: float = Field(default=1.0, alias="HTTP_BACKOFF_SECONDS")
+    pandora_chunk_rows: int = Field(default=250_000, alias="PANDORA_CHUNK_ROWS")
+    earthdata_download_concurrency: int = Field(default=4, alias="EARTHDATA_DOWNLOAD_CONCURRENCY")
+    earthdata_convert_workers: int = Field(default=2, alias="EARTHDATA_CONVERT_WORKERS")
+    earthdata_session_ttl_seconds: int = Field(default=3600, alias="EARTHDATA_SESSION_TTL_SECONDS")
+    earthdata_search_ttl_seconds: int = Field(default=300, alias="EARTHDATA_SEARCH_TTL_SECONDS")
+    zarr_spatial_chunk: int = Field(default=512, alias="ZARR_SPATIAL_CHUNK")
+    timeseries_layout: bool = Field(default=False, alias="TIMESERIES_LAYOUT")
+    timeseries_spatial_chunk: int = Field(default=16, alias="TIMESERIES_SPATIAL_CHUNK")
+    timeseries_time_chunk: int = Field(default=720, alias="TIMESERIES_TIME_CHUNK")
+    granule_cache_dir: Path | None = Field(default=None, alias="GRANULE_CACHE_DIR")
+    granule_cache_max_gb: float = Field(default=20.0, alias="GRANULE_CACHE_MAX_GB")
+    # Common grid gridded sources are regridded onto at ingest ("" disables)
+    analysis_grid_bbox: str = Field(default="-125,24,-66,50", alias="ANALYSIS_GRID_BBOX")
+    analysis_grid_res: float = Field(default=0.1, alias="ANALYSIS_GRID_RES")
+    # Gridded values further than this from an observation are left missing in the feature store
+    feature_time_tolerance_hours: float = Field(default=3.0, alias="FEATURE_TIME_TOLERANCE_HOURS")
+    # Harmony subsets are split into bbox/time tiles submitted in parallel (0 disables a split)
+    harmony_tile_deg: float = Field(default=5.0, alias="HARMONY_TILE_DEG")
+    harmony_time_step_hours: int = Field(default=0, alias="HARMONY_TIME_STEP_HOURS")
+    harmony_concurrency: int = Field(default=4, alias="HARMONY_CONCURRENCY")
+
+    # Ingestion jobs; queued jobs only run with a worker: the API's child process, or
+    # `python worker.py` run separately when JOB_WORKER_EMBEDDED=false
+    job_worker_embedded: bool = Field(default=True, alias="JOB_WORKER_EMBEDDED")
+    job_max_concurrency: int = Field(default=4, alias="JOB_MAX_CONCURRENCY")
+    # Comma-separated source=limit pairs; sources not listed get 1
+    job_source_concurrency: str = Field(default="openaq=2,airnow=2", alias="JOB_SOURCE_CONCURRENCY")
+    job_poll_seconds: float = Field(default=1.0, alias="JOB_POLL_SECONDS")
+    job_stale_seconds: int = Field(default=300, alias="JOB_STALE_SECONDS")
+    # Periodic ingests, e.g. "openaq=15m,airnow=30m,tempo_nrt=1h,imerg_early=30m,merra2=1d"
+    ingest_schedule: str = Field(default="", alias="INGEST_SCHEDULE")
+    ingest_schedule_jitter_seconds: int = Field(default=60, alias="INGEST_SCHEDULE_JITTER_SECONDS")
+    scheduler_lease_seconds: int = Field(default=60, alias="SCHEDULER_LEASE_SECONDS")
+
+    # Batch inference: rows per chunk (also the Zarr chunk of the written predictions) and threads
+    predict_chunk_rows: int = Field(default=100_000, alias="PREDICT_CHUNK_ROWS")
+    predict_workers: int = Field(default=4, alias="PREDICT_WORKERS")
+    # XGBoost inference backend: sklearn, inplace, treelite or onnx (see services/xgb_backends.py)
+    xgb_backend: str = Field(default="inplace", alias="XGB_BACKEND")
+
+    # XGBoost training: rows per streamed chunk, newest fraction of rows held out for
+    # validation, boosting rounds and early-stopping patience
+    train_chunk_rows: int = Field(default=500_000, alias="TRAIN_CHUNK_ROWS")
+    train_valid_fraction: float = Field(default=0.2, alias="TRAIN_VALID_FRACTION")
+    xgb_num_boost_round: int = Field(default=1000, alias="XGB_NUM_BOOST_ROUND")
+    xgb_early_stopping_rounds: int = Field(default=30, alias="XGB_EARLY_STOPPING_ROUNDS")
+    xgb_max_bin: int = Field(default=256, alias="XGB_MAX_BIN")
+    # Keep quantized training pages on disk (under MODEL_DIR/xgb_cache) instead of RAM
+    xgb_external_memory: bool = Field(default=False, alias="XGB_EXTERNAL_MEMORY")
+    # Training jobs run in this many worker processes; older model versions beyond
+    # MODEL_KEEP_VERSIONS are pruned
+    train_workers: int = Field(default=1, alias="TRAIN_WORKERS")
+    model_keep_versions: int = Field(default=10, alias="MODEL_KEEP_VERSIONS")
+    # A new model replaces the served one only when its validation MAE is lower by this fraction
+    model_promote_min_improvement: float = Field(default=0.001, alias="MODEL_PROMOTE_MIN_IMPROVEMENT")
+
+    # LSTM inference: concurrent requests are merged into one predict of up to
+    # LSTM_BATCH_MAX windows, waiting at most LSTM_BATCH_WAIT_MS for company
+    lstm_batch_max: int = Field(default=64, alias="LSTM_BATCH_MAX")
+    lstm_batch_wait_ms: float = Field(default=2.0, alias="LSTM_BATCH_WAIT_MS")
+    # Rolling per-station history fed to the LSTM: observations kept per station and
+    # how far a request may be from the station it borrows history from
+    station_buffer_size: int = Field(default=168, alias="STATION_BUFFER_SIZE")
+    station_buffer_max_km: float = Field(default=50.0, alias="STATION_BUFFER_MAX_KM")
+
     # Caching
     redis_url: str | None = Field(default=None, alias="REDIS_URL")
 
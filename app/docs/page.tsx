@@ -44,6 +44,7 @@ export default function DocsPage() {
           <li><code>POST /api/ingest/imerg</code> – params: <code>product</code>, <code>time_range</code>, <code>schedule</code></li>
           <li><code>POST /api/ingest/pandora</code> – params: <code>url</code>, <code>parameter</code>, <code>schedule</code></li>
           <li><code>GET /api/forecast/aqi/timeline</code> – params: <code>lat</code>, <code>lon</code>, <code>hours</code></li>
+          <li><code>POST /api/forecast/timeline/batch</code> – JSON body: <code>locations</code> (list of <code>lat</code>/<code>lon</code>), <code>hours</code></li>
         </ul>
       </Section>
 
@@ -2,7 +2,7 @@ from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import ORJSONResponse, PlainTextResponse, JSONResponse
-from routers import health, ingest, datasets, forecast, collocate, stations, ws, air_quality
+from routers import health, ingest, jobs, datasets, forecast, collocate, stations, ws, air_quality
 try:
     from routers import alerts, weather, auth  # optional
 except Exception:  # pragma: no cover
@@ -12,9 +12,16 @@ except Exception:  # pragma: no cover
 from config import settings
 from logging_config import configure_logging
 from db import init_db
+from services.http_client import close_async_client
+from services.scheduler import IngestScheduler
+from services.earthdata import shutdown_pool as shutdown_convert_pool
+from services.training import shutdown_pool as shutdown_training_pool
 from middleware import security_headers_middleware, rate_limit_middleware, request_id_middleware
 from pathlib import Path
+import logging
+import multiprocessing
 import os
+import worker
 
 try:
     from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
@@ -25,6 +32,7 @@ except Exception:  # pragma: no cover
     CONTENT_TYPE_LATEST = 'text/plain'
 
 configure_logging(settings.log_level)
+logger = logging.getLogger(__name__)
 
 # Prefer ORJSON when available, otherwise fall back to standard JSONResponse
 # Avoid optional dependency issues with orjson by falling back to JSONResponse
@@ -89,12 +97,46 @@ async def cache_control(request: Request, call_next):
         response.headers.setdefault('Cache-Control', 'public, max-age=60')
     return response
 
+_worker: multiprocessing.Process | None = None
+_scheduler: IngestScheduler | None = None
+
 @app.on_event("startup")
 def _startup():
+    global _worker
     init_db()
+    if settings.job_worker_embedded:
+        # A child process rather than threads, so ingests and training never compete
+        # with request handling for the GIL; not a daemon since it starts its own pools
+        _worker = multiprocessing.get_context("spawn").Process(target=worker.run, name="ingest-worker")
+        _worker.start()
+    else:
+        logger.warning(
+            "JOB_WORKER_EMBEDDED is off: queued ingest and training jobs only run "
+            "while a separate worker is up (python worker.py)"
+        )
+
+@app.on_event("startup")
+async def _start_ingest_scheduler():
+    global _scheduler
+    if settings.ingest_schedule:
+        _scheduler = IngestScheduler()
+        _scheduler.start()
+
+@app.on_event("shutdown")
+async def _shutdown():
+    if _scheduler is not None:
+        await _scheduler.stop()
+    if _worker is not None:
+        import anyio
+        _worker.terminate()
+        await anyio.to_thread.run_sync(_worker.join, 30)
+    shutdown_training_pool()
+    shutdown_convert_pool()
+    await close_async_client()
 
 app.include_router(health.router, prefix="/api")
 app.include_router(ingest.router, prefix="/api")
+app.include_router(jobs.router, prefix="/api")
 app.include_router(datasets.router, prefix="/api")
 app.include_router(forecast.router, prefix="/api")
 app.include_router(collocate.router, prefix="/api")
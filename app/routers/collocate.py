@@ -2,6 +2,7 @@ from fastapi import APIRouter, Query
 import numpy as np
 import xarray as xr
 from services.storage import get_zarr_target
+from services.earthdata import open_timeseries
 from services.collocate import collocate, collocate_points_with_grid, compute_metrics
 
 router = APIRouter()
@@ -31,9 +32,10 @@ def collocate_tempo_pandora(
     max_km: float = Query(default=25.0, ge=0),
     max_minutes: int = Query(default=60, ge=0),
 ) -> dict:
-    tempo_path = get_zarr_target(tempo_ds)
     pandora_path = get_zarr_target(pandora_ds)
-    TEMPO = xr.open_zarr(tempo_path)
+    # Station-by-station lookups of grid cells over time: the time-series layout
+    # serves them from a few chunks when it exists
+    TEMPO = open_timeseries(tempo_ds)
     PANDORA = xr.open_zarr(pandora_path)
     C = collocate_points_with_grid(PANDORA, TEMPO, grid_var=grid_var, max_km=max_km, max_minutes=max_minutes)
     metrics = compute_metrics(C)
@@ -48,9 +50,10 @@ def collocate_tempo_pandora_csv(
     max_km: float = Query(default=25.0, ge=0),
     max_minutes: int = Query(default=60, ge=0),
 ) -> str:
-    tempo_path = get_zarr_target(tempo_ds)
     pandora_path = get_zarr_target(pandora_ds)
-    TEMPO = xr.open_zarr(tempo_path)
+    # Station-by-station lookups of grid cells over time: the time-series layout
+    # serves them from a few chunks when it exists
+    TEMPO = open_timeseries(tempo_ds)
     PANDORA = xr.open_zarr(pandora_path)
     C = collocate_points_with_grid(PANDORA, TEMPO, grid_var=grid_var, max_km=max_km, max_minutes=max_minutes)
     # Emit simple CSV header and rows (a_value,b_value,distance_km,a_time)
@@ -1,7 +1,11 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query
 from pathlib import Path
+from typing import Optional
 from config import settings
+import numpy as np
 import xarray as xr
+from services.earthdata import open_timeseries
+from services.storage import get_zarr_target, zarr_exists
 
 router = APIRouter()
 
@@ -35,6 +39,37 @@ def dataset_stats() -> dict:
     return stats
 
 
+@router.get("/datasets/{name}/timeseries")
+def dataset_timeseries(
+    name: str,
+    lat: float,
+    lon: float,
+    var: Optional[str] = Query(default=None, description="Variable to return (all when omitted)"),
+) -> dict:
+    """History of the grid cell nearest (lat, lon), read from the store's time-series
+    layout when one was written (TIMESERIES_LAYOUT)."""
+    if not zarr_exists(get_zarr_target(name, partitioned=False)):
+        raise HTTPException(status_code=404, detail="Not found")
+    ds = open_timeseries(name)
+    ydim = next((d for d in ("lat", "latitude") if d in ds.coords), None)
+    xdim = next((d for d in ("lon", "longitude") if d in ds.coords), None)
+    if ydim is None or xdim is None or "time" not in ds.dims:
+        raise HTTPException(status_code=400, detail="Not a gridded time series")
+    names = [var] if var else [v for v in ds.data_vars if set(ds[v].dims) == {ydim, xdim, "time"}]
+    if var and var not in ds:
+        raise HTTPException(status_code=404, detail=f"Unknown variable: {var}")
+    cell = ds[names].sel({ydim: lat, xdim: lon}, method="nearest").load()
+    return {
+        "lat": float(cell[ydim]),
+        "lon": float(cell[xdim]),
+        "time": [str(t) for t in cell["time"].values.astype("datetime64[s]")],
+        "values": {
+            v: [None if np.isnan(x) else float(x) for x in np.asarray(cell[v].values, dtype=float).ravel()]
+            for v in names
+        },
+    }
+
+
 @router.get("/datasets/meta")
 def dataset_meta() -> dict:
     meta: dict[str, dict] = {}
@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Query
-from pydantic import BaseModel
-from services.model_xgb import predict_stub, train_from_zarr, batch_predict_from_zarr, timeline_forecast
+import asyncio
+from typing import List, Literal
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+from services.model_xgb import (
+    predict_stub, train_from_zarr, train_from_features, batch_predict_from_zarr, batch_predict_from_features, timeline_forecast,
+    timeline_forecast_batch, resolve_parameter_id,
+)
+from services.features import FEATURE_STORE, backfill_features
+from services.model_registry import list_versions, registry
+from services.jobs import enqueue
 from services.model_lstm import train_lstm_from_zarr, predict_lstm_timeline
 from services.explain import explain_xgb
 from services.storage import get_zarr_target
-from services.cache import cache_get, cache_set
+from services.cache import cache_get, cache_set, cache_get_many, cache_set_many
 from services.aqi import categorize_aqi
 
 router = APIRouter()
@@ -19,33 +27,113 @@ class PredictRequest(BaseModel):
     lat: float | None = None
     lon: float | None = None
     parameter_id: float | None = None
+    # Parameter name (e.g. "pm25"); encoded with the trained model's schema, overrides parameter_id
+    parameter: str | None = None
     hour: float | None = None
     weekday: float | None = None
 
 
+class TimelineLocation(BaseModel):
+    lat: float
+    lon: float
+
+
+class TimelineBatchRequest(BaseModel):
+    locations: List[TimelineLocation] = Field(min_length=1, max_length=2000)
+    hours: int = Field(default=24, ge=1, le=336)
+    parameter_id: float = 0.0
+    parameter: str | None = None
+
+
+def _timeline_key(lat: float, lon: float, hours: int, parameter_id: float) -> str:
+    return f"timeline:{lat:.3f}:{lon:.3f}:{hours}:{parameter_id:g}"
+
+
 @router.post("/forecast/predict")
 async def forecast_predict(payload: PredictRequest) -> dict:
     yhat = await predict_stub(payload.model_dump())
     return {"aqi_prediction": yhat}
 
 
+Promote = Literal["auto", "force", "never"]
+MODEL_VERSIONS = ("xgb_aqi", "lstm_aqi")
+
+
+async def _queue_training(source: str, **params) -> dict:
+    job, coalesced = await asyncio.to_thread(enqueue, source, params)
+    return {"status": "queued", "job_id": job.id, "coalesced": coalesced}
+
+
 @router.post("/forecast/train")
-def forecast_train(zarr_name: str = Query(default="openaq_latest")) -> dict:
+async def forecast_train(
+    zarr_name: str = Query(default=FEATURE_STORE, description="Observation store, or the feature store"),
+    days: int | None = Query(default=None, description="Feature store: train on the last N day partitions"),
+    promote: Promote = Query(default="auto", description="auto: serve the new model only if it beats the current one"),
+    schedule: bool = Query(default=True, description="Train in the background as a job (see /api/jobs/{id})"),
+) -> dict:
+    if schedule:
+        return await _queue_training("train_xgb", zarr_name=zarr_name, days=days, promote=promote)
+    if zarr_name == FEATURE_STORE:
+        return await asyncio.to_thread(train_from_features, days, promote=promote)
     path = get_zarr_target(zarr_name)
-    result = train_from_zarr(path)
-    return result
+    return await asyncio.to_thread(train_from_zarr, path, promote=promote)
 
 
-@router.get("/forecast/batch_predict")
-def forecast_batch_predict(zarr_name: str = Query(default="openaq_latest")) -> dict:
+@router.post("/forecast/features/backfill")
+async def forecast_features_backfill(
+    days: int | None = Query(default=None, description="Rebuild only the last N day partitions"),
+    schedule: bool = Query(default=True, description="Run in the background as a job (see /api/jobs/{id})"),
+) -> dict:
+    """Rebuild the feature store from the OpenAQ/AirNow observation stores, e.g. for
+    data ingested before the feature store existed."""
+    if schedule:
+        return await _queue_training("backfill_features", days=days)
+    return await asyncio.to_thread(backfill_features, days)
+
+
+@router.get("/forecast/models")
+def forecast_models() -> dict:
+    """Models loaded in this process, with load counts and timings."""
+    return registry.metrics()
+
+
+@router.get("/forecast/models/{name}/versions")
+def forecast_model_versions(name: str) -> List[dict]:
+    """Saved training runs, newest first, with metrics and which one is served."""
+    if name not in MODEL_VERSIONS:
+        raise HTTPException(status_code=404, detail="Not found")
+    return list_versions(name)
+
+
+def _batch_predict(zarr_name: str, days: int | None, write: bool) -> dict:
+    if zarr_name == FEATURE_STORE:
+        return batch_predict_from_features(days, write=write)
     path = get_zarr_target(zarr_name)
-    result = batch_predict_from_zarr(path)
-    return result
+    return batch_predict_from_zarr(path, write=write)
+
+
+@router.get("/forecast/batch_predict")
+def forecast_batch_predict(
+    zarr_name: str = Query(default=FEATURE_STORE, description="Observation store, or the feature store"),
+    days: int | None = Query(default=None, description="Feature store: predict over the last N day partitions"),
+) -> dict:
+    """Prediction summary only; nothing is written (see POST)."""
+    return _batch_predict(zarr_name, days, write=False)
+
+
+@router.post("/forecast/batch_predict")
+def forecast_batch_predict_write(
+    zarr_name: str = Query(default=FEATURE_STORE, description="Observation store, or the feature store"),
+    days: int | None = Query(default=None, description="Feature store: predict over the last N day partitions"),
+    write: bool = Query(default=True, description="Store predictions in the 'predictions' sidecar store, keyed on obs"),
+) -> dict:
+    return _batch_predict(zarr_name, days, write=write)
 
 
 @router.get("/forecast/timeline")
-def forecast_timeline(lat: float, lon: float, parameter_id: float = 0.0, hours: int = 24) -> dict:
-    key = f"timeline:{lat:.3f}:{lon:.3f}:{hours}"
+def forecast_timeline(lat: float, lon: float, parameter_id: float = 0.0, hours: int = 24, parameter: str | None = None) -> dict:
+    parameter_id = resolve_parameter_id(parameter, parameter_id)
+    key = _timeline_key(lat, lon, hours, parameter_id)
     cached = cache_get(key)
     if cached is not None:
         return cached
@@ -54,6 +142,44 @@ def forecast_timeline(lat: float, lon: float, parameter_id: float = 0.0, hours:
     return data
 
 
+@router.post("/forecast/timeline/batch")
+def forecast_timeline_batch(payload: TimelineBatchRequest) -> dict:
+    """Timelines for many locations in one call. Cached locations come from one
+    multi-get (shared with /forecast/timeline); the rest are predicted together.
+    Columnar result: row i of mean/lower/upper belongs to locations[i] and starts
+    at start[i], one value per hour."""
+    lats = [loc.lat for loc in payload.locations]
+    lons = [loc.lon for loc in payload.locations]
+    parameter_id = resolve_parameter_id(payload.parameter, payload.parameter_id)
+    keys = [_timeline_key(lat, lon, payload.hours, parameter_id) for lat, lon in zip(lats, lons)]
+    entries = cache_get_many(keys)
+    missing = [i for i, e in enumerate(entries) if e is None]
+    if missing:
+        fresh = timeline_forecast_batch(
+            [lats[i] for i in missing], [lons[i] for i in missing], parameter_id, payload.hours
+        )
+        new = {}
+        for j, i in enumerate(missing):
+            entries[i] = {
+                "times": fresh["times"],
+                "mean": fresh["mean"][j],
+                "lower": fresh["lower"][j],
+                "upper": fresh["upper"][j],
+            }
+            new[keys[i]] = entries[i]
+        cache_set_many(new, ttl_seconds=120)
+    return {
+        "hours": payload.hours,
+        "lat": lats,
+        "lon": lons,
+        "start": [e["times"][0] for e in entries],
+        "mean": [e["mean"] for e in entries],
+        "lower": [e["lower"] for e in entries],
+        "upper": [e["upper"] for e in entries],
+        "cached": len(entries) - len(missing),
+    }
+
+
 @router.get("/forecast/aqi/timeline")
 def forecast_aqi_timeline(lat: float, lon: float, hours: int = 24) -> dict:
     key = f"aqi_timeline:{lat:.3f}:{lon:.3f}:{hours}"
@@ -85,18 +211,33 @@ def forecast_aqi_timeline(lat: float, lon: float, hours: int = 24) -> dict:
 
 
 @router.post("/forecast/lstm/train")
-def forecast_lstm_train(zarr_name: str = Query(default="openaq_latest"), window: int = 24, horizon: int = 24, epochs: int = 5) -> dict:
+async def forecast_lstm_train(
+    zarr_name: str = Query(default="openaq_latest"),
+    window: int = 24,
+    horizon: int = 24,
+    epochs: int = 5,
+    promote: Promote = Query(default="auto", description="auto: serve the new model only if it beats the current one"),
+    schedule: bool = Query(default=True, description="Train in the background as a job (see /api/jobs/{id})"),
+) -> dict:
+    if schedule:
+        return await _queue_training(
+            "train_lstm", zarr_name=zarr_name, window=window, horizon=horizon, epochs=epochs, promote=promote
+        )
     path = get_zarr_target(zarr_name)
-    return train_lstm_from_zarr(path, window=window, horizon=horizon, epochs=epochs)
+    return await asyncio.to_thread(
+        train_lstm_from_zarr, path, window=window, horizon=horizon, epochs=epochs, promote=promote
+    )
 
 
 @router.get("/forecast/lstm/timeline")
-def forecast_lstm_timeline(lat: float, lon: float, horizon: int = 24, baseline: float | None = None) -> dict:
-    key = f"lstm:{lat:.3f}:{lon:.3f}:{horizon}:{baseline if baseline is not None else 'na'}"
+def forecast_lstm_timeline(
+    lat: float, lon: float, horizon: int = 24, baseline: float | None = None, parameter: str | None = None
+) -> dict:
+    key = f"lstm:{lat:.3f}:{lon:.3f}:{horizon}:{baseline if baseline is not None else 'na'}:{parameter or '*'}"
     cached = cache_get(key)
     if cached is not None:
         return cached
-    data = predict_lstm_timeline(lat=lat, lon=lon, horizon=horizon, baseline=baseline)
+    data = predict_lstm_timeline(lat=lat, lon=lon, horizon=horizon, baseline=baseline, parameter=parameter)
     cache_set(key, data, ttl_seconds=180)
     return data
 
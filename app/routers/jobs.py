@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+from services.jobs import get_job, job_to_dict, list_jobs
+
+router = APIRouter()
+
+
+@router.get("/jobs", response_model=List[dict])
+def jobs_list(
+    status: Optional[str] = Query(default=None, description="queued, running, succeeded or failed"),
+    source: Optional[str] = Query(default=None),
+    limit: int = Query(default=50, ge=1, le=500),
+) -> List[dict]:
+    return [job_to_dict(j) for j in list_jobs(status=status, source=source, limit=limit)]
+
+
+@router.get("/jobs/{job_id}", response_model=dict)
+def job_status(job_id: int) -> dict:
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Not found")
+    return job_to_dict(job)
@@ -1,4 +1,5 @@
 from __future__ import annotations
+import asyncio
 import httpx
 import pandas as pd
 import xarray as xr
@@ -6,20 +7,26 @@ import numpy as np
 from typing import Optional, List
 from datetime import datetime, timezone
 from config import settings
-from services.storage import get_zarr_target
+from services.storage import get_zarr_target, store_lock, string_values, time_values, write_partitioned
+from services.http_client import get_async_client, get_with_retry
+from services.tiling import split_bbox
+from services.ingest_state import drop_seen, get_watermark, mark_seen, set_watermark
+from services.jobs import report_progress
+from services.features import append_features, update_latest_features
+from services.station_buffer import update_station_buffer
 
+# Identity of an observation for incremental ingestion / dedupe
+AIRNOW_KEY = ["siteName", "parameter", "datetime"]
+AIRNOW_URL = "https://www.airnowapi.org/aq/data/"
 
-async def fetch_airnow(
+
+def _airnow_params(
+    key: str,
     bbox: Optional[str],
     start_date: Optional[str],
     end_date: Optional[str],
     parameter: Optional[str],
-    api_key: Optional[str] = None,
-    limit: int = 1000,
-) -> pd.DataFrame:
-    key = api_key or settings.airnow_api_key
-    if not key:
-        raise ValueError("AIRNOW_API_KEY not provided")
+) -> dict:
     params = {
         "format": "application/json",
         "API_KEY": key,
@@ -34,11 +41,58 @@ async def fetch_airnow(
         params["endDate"] = end_date
     if parameter:
         params["parameters"] = parameter
-    url = "https://www.airnowapi.org/aq/data/"
-    async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.get(url, params=params)
-        r.raise_for_status()
-        data = r.json()
+    return params
+
+
+async def fetch_airnow(
+    bbox: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    parameter: Optional[str],
+    api_key: Optional[str] = None,
+    limit: int = 1000,
+) -> pd.DataFrame:
+    key = api_key or settings.airnow_api_key
+    if not key:
+        raise ValueError("AIRNOW_API_KEY not provided")
+    params = _airnow_params(key, bbox, start_date, end_date, parameter)
+    r = await get_async_client().get(AIRNOW_URL, params=params, timeout=60)
+    r.raise_for_status()
+    return normalize_airnow(r.json())
+
+
+async def fetch_airnow_tiled(
+    bbox: str,
+    start_date: Optional[str],
+    end_date: Optional[str],
+    parameter: Optional[str],
+    tile_deg: float,
+    api_key: Optional[str] = None,
+    concurrency: Optional[int] = None,
+) -> pd.DataFrame:
+    """Fetch `bbox` as a grid of tiles with bounded parallelism and retry/backoff.
+    Observations on tile edges come back twice and are deduplicated on AIRNOW_KEY.
+    """
+    key = api_key or settings.airnow_api_key
+    if not key:
+        raise ValueError("AIRNOW_API_KEY not provided")
+    client = get_async_client()
+    sem = asyncio.Semaphore(max(1, concurrency or settings.airnow_concurrency))
+
+    async def _tile(tile: str) -> pd.DataFrame:
+        async with sem:
+            data = await get_with_retry(client, AIRNOW_URL, params=_airnow_params(key, tile, start_date, end_date, parameter))
+        return await asyncio.to_thread(normalize_airnow, data)
+
+    frames = await asyncio.gather(*[_tile(t) for t in split_bbox(bbox, tile_deg)])
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return normalize_airnow([])
+    df = pd.concat(frames, ignore_index=True)
+    return df.drop_duplicates(subset=AIRNOW_KEY, ignore_index=True)
+
+
+def normalize_airnow(data: List[dict]) -> pd.DataFrame:
     if not data:
         return pd.DataFrame(columns=[
             "datetime","parameter","value","unit","latitude","longitude","siteName","aqi"
@@ -108,32 +162,69 @@ async def fetch_airnow(
     return out
 
 
-async def ingest_airnow_to_zarr(
-    bbox: Optional[str], start_date: Optional[str], end_date: Optional[str], parameter: Optional[str], limit: int = 1000
-) -> int:
-    df = await fetch_airnow(bbox=bbox, start_date=start_date, end_date=end_date, parameter=parameter, limit=limit)
-    if df.empty:
-        ds = xr.Dataset({"value": ("obs", np.array([], dtype=float))}, coords={"obs": np.array([], dtype=int)})
-        target = get_zarr_target("airnow_measurements", partitioned=False)
-        ds.to_zarr(target, mode="w")
-        return 0
+def _airnow_dataset(df: pd.DataFrame) -> xr.Dataset:
     obs_index = np.arange(len(df))
     ds = xr.Dataset(
         {"value": ("obs", df["value"].to_numpy())},
         coords={
             "obs": obs_index,
-            "time": ("obs", df["datetime"].to_numpy()),
+            "time": ("obs", time_values(df["datetime"])),
             "lat": ("obs", df["latitude"].astype(float).to_numpy()),
             "lon": ("obs", df["longitude"].astype(float).to_numpy()),
-            "parameter": ("obs", df.get("parameter", pd.Series(["unknown"]).repeat(len(df))).astype(str).to_numpy()),
-            "unit": ("obs", df.get("unit", pd.Series(["unknown"]).repeat(len(df))).astype(str).to_numpy()),
-            "location": ("obs", df.get("siteName", pd.Series([""]).repeat(len(df))).astype(str).to_numpy()),
+            "parameter": ("obs", string_values(df.get("parameter", pd.Series(["unknown"]).repeat(len(df))))),
+            "unit": ("obs", string_values(df.get("unit", pd.Series(["unknown"]).repeat(len(df))))),
+            "location": ("obs", string_values(df.get("siteName", pd.Series([""]).repeat(len(df))))),
             "aqi": ("obs", df.get("aqi", pd.Series([np.nan]).repeat(len(df))).to_numpy()),
         },
     )
-    dt = pd.to_datetime(df["datetime"].max(), utc=True).to_pydatetime()
-    target = get_zarr_target("airnow_measurements", partitioned=True, dt=dt)
-    ds.to_zarr(target, mode="w")
+    return ds
+
+
+def _write_batch(df: pd.DataFrame) -> pd.DataFrame:
+    """Write the fetched rows and return the ones that were new."""
     latest = get_zarr_target("airnow_latest", partitioned=False)
-    ds.to_zarr(latest, mode="w")
-    return int(len(df))
+    with store_lock("airnow_latest"):
+        _airnow_dataset(df).to_zarr(latest, mode="w")
+    # Dedupe, append, feature rows and marking the keys seen form one step against
+    # other ingest jobs and a feature backfill
+    with store_lock("airnow_measurements"):
+        new = drop_seen("airnow_measurements", df, AIRNOW_KEY)
+        if new.empty:
+            return new
+        write_partitioned(new, "airnow_measurements", _airnow_dataset)
+        mark_seen("airnow_measurements", new, AIRNOW_KEY)
+        append_features(new, station_col="siteName")
+    update_latest_features(new, station_col="siteName")
+    update_station_buffer(new, station_col="siteName")
+    return new
+
+
+async def ingest_airnow_to_zarr(
+    bbox: Optional[str], start_date: Optional[str], end_date: Optional[str], parameter: Optional[str], limit: int = 1000,
+    tile_deg: Optional[float] = None, concurrency: Optional[int] = None,
+) -> int:
+    state_key = f"airnow:bbox={bbox or '*'}:parameter={parameter or '*'}"
+    if start_date is None:
+        # Resume from the last ingested hour; rows at the boundary are deduped below
+        watermark = get_watermark(state_key)
+        if watermark is not None:
+            start_date = watermark.strftime("%Y-%m-%dT%H")
+    if bbox and tile_deg:
+        df = await fetch_airnow_tiled(
+            bbox=bbox, start_date=start_date, end_date=end_date, parameter=parameter,
+            tile_deg=tile_deg, concurrency=concurrency,
+        )
+    else:
+        df = await fetch_airnow(bbox=bbox, start_date=start_date, end_date=end_date, parameter=parameter, limit=limit)
+    if df.empty:
+        ds = xr.Dataset({"value": ("obs", np.array([], dtype=float))}, coords={"obs": np.array([], dtype=int)})
+        target = get_zarr_target("airnow_measurements", partitioned=False)
+        await asyncio.to_thread(ds.to_zarr, target, mode="w")
+        return 0
+    # Disk and Zarr work runs off the event loop so other jobs and heartbeats keep going
+    new = await asyncio.to_thread(_write_batch, df)
+    await asyncio.to_thread(report_progress, fetched=int(len(df)), new=int(len(new)))
+    if new.empty:
+        return 0
+    await asyncio.to_thread(set_watermark, state_key, pd.to_datetime(new["datetime"].max(), utc=True).to_pydatetime())
+    return int(len(new))
@@ -1,7 +1,7 @@
 from __future__ import annotations
 import json
 import os
-from typing import Optional, Callable, Any
+from typing import Optional, Callable, Any, Dict, List
 from config import settings
 
 try:
@@ -47,3 +47,35 @@ def cache_set(key: str, value: Any, ttl_seconds: int = 60) -> None:
         c.setex(key, ttl_seconds, json.dumps(value))
     except Exception:
         pass
+
+
+def cache_get_many(keys: List[str]) -> List[Optional[Any]]:
+    """Values for `keys` in order (None for misses), fetched with one MGET."""
+    c = get_client()
+    if not c or not keys:
+        return [None] * len(keys)
+    try:
+        raw = c.mget(keys)
+    except Exception:
+        return [None] * len(keys)
+    out: List[Optional[Any]] = []
+    for v in raw:
+        try:
+            out.append(json.loads(v) if v is not None else None)
+        except Exception:
+            out.append(None)
+    return out
+
+
+def cache_set_many(items: Dict[str, Any], ttl_seconds: int = 60) -> None:
+    """Set several keys in one pipelined round trip."""
+    c = get_client()
+    if not c or not items:
+        return
+    try:
+        pipe = c.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.setex(key, ttl_seconds, json.dumps(value))
+        pipe.execute()
+    except Exception:
+        pass
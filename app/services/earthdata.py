@@ -0,0 +1,303 @@
+from __future__ import annotations
+import asyncio
+import multiprocessing
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import xarray as xr
+
+try:
+    import earthaccess
+except Exception:  # pragma: no cover
+    earthaccess = None
+
+from config import settings
+from services.storage import TIME_UNITS, get_zarr_target, zarr_exists
+from services.regrid import append_analysis
+from services import granule_cache
+from services.ingest_state import get_ledger, record_ingested, reset_ledger
+from services.jobs import report_progress
+
+# Selects the variables to keep from an opened granule; must be a module-level
+# function so it can be sent to the conversion process pool.
+Selector = Callable[[xr.Dataset], Optional[xr.Dataset]]
+
+SPATIAL_DIMS = {"lat", "lon", "latitude", "longitude", "y", "x"}
+# Encoding keys that describe values rather than on-disk layout
+_VALUE_ENCODING = {"dtype", "units", "calendar", "_FillValue", "missing_value", "scale_factor", "add_offset"}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+_login_lock = threading.Lock()
+_login_at: Optional[float] = None
+_search_lock = threading.Lock()
+_search_cache: Dict[tuple, Tuple[float, list]] = {}
+
+
+def ensure_login(force: bool = False) -> None:
+    """Log in once per process and again only when the session is older than
+    EARTHDATA_SESSION_TTL_SECONDS, earthaccess reports it unauthenticated or `force`.
+    """
+    global _login_at
+    if earthaccess is None:
+        raise ImportError("earthaccess not installed")
+    with _login_lock:
+        auth = getattr(earthaccess, "__auth__", None)
+        authenticated = getattr(auth, "authenticated", True) if auth is not None else True
+        fresh = _login_at is not None and time.monotonic() - _login_at < settings.earthdata_session_ttl_seconds
+        if fresh and authenticated and not force:
+            return
+        earthaccess.login(strategy="netrc", persist=True)
+        _login_at = time.monotonic()
+
+
+def search_granules(**query) -> list:
+    """CMR search with a TTL cache keyed on the query, so scheduled ingests that repeat
+    the same (short_name, temporal, version) skip the round trip.
+    """
+    key = tuple(sorted((k, str(v)) for k, v in query.items()))
+    now = time.monotonic()
+    ttl = settings.earthdata_search_ttl_seconds
+    with _search_lock:
+        hit = _search_cache.get(key)
+        if hit is not None and now - hit[0] < ttl:
+            return hit[1]
+    ensure_login()
+    try:
+        results = earthaccess.search_data(**query)
+    except Exception:
+        # Most likely an expired token: log in again and retry once
+        ensure_login(force=True)
+        results = earthaccess.search_data(**query)
+    with _search_lock:
+        for k in [k for k, (at, _) in _search_cache.items() if now - at >= ttl]:
+            del _search_cache[k]
+        _search_cache[key] = (now, results)
+    return results
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a process that already runs HDF5/netCDF threads can deadlock
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, settings.earthdata_convert_workers),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def chunk_spec(ds: xr.Dataset, spatial: int, time: int = 1) -> Dict[str, int]:
+    """Dask chunks for `ds`: `time` steps by `spatial` cells, other dims whole."""
+    spec = {}
+    for dim in ds.dims:
+        if dim == "time":
+            spec[dim] = time
+        elif str(dim).lower() in SPATIAL_DIMS:
+            spec[dim] = spatial
+        else:
+            spec[dim] = -1
+    return spec
+
+
+def _drop_layout_encoding(ds: xr.Dataset) -> xr.Dataset:
+    # Source chunk/compression settings would conflict with the dask chunks we write
+    for var in ds.variables.values():
+        var.encoding = {k: v for k, v in var.encoding.items() if k in _VALUE_ENCODING}
+    return ds
+
+
+def _convert_granule(nc_path: str, out_path: str, select: Selector) -> int:
+    """Runs in a worker process: NetCDF granule -> staging Zarr store.
+
+    The granule is opened lazily and rechunked so to_zarr streams one dask chunk
+    at a time instead of loading whole variables into memory.
+    """
+    ds = xr.open_dataset(nc_path, engine="netcdf4", chunks={})
+    try:
+        slim = select(ds)
+        if slim is None or len(slim.data_vars) == 0:
+            return 0
+        if "time" in slim.coords and "time" not in slim.dims:
+            slim = slim.expand_dims("time")
+        slim = _drop_layout_encoding(slim.chunk(chunk_spec(slim, settings.zarr_spatial_chunk)))
+        slim.to_zarr(out_path, mode="w")
+        return int(slim[list(slim.data_vars)[0]].size)
+    finally:
+        ds.close()
+
+
+def _start_time(path: str) -> Tuple[bool, int]:
+    """Sort key for a staged store: stores without a time coordinate go last."""
+    ds = xr.open_zarr(path)
+    if "time" not in ds.coords or ds["time"].size == 0:
+        return True, 0
+    return False, int(np.asarray(ds["time"].values).min().astype("datetime64[s]").astype("int64"))
+
+
+def _append_staged(staged: Sequence[str], target: str, analysis: Optional[str] = None) -> None:
+    """Append staged granule stores to `target` along time, oldest first, and
+    regrid each onto the analysis grid as `analysis` when given.
+
+    Granules without a time axis are stacked along a synthetic `granule` dim
+    instead, so each one is kept rather than replacing the previous.
+    """
+    for path in sorted(staged, key=_start_time):
+        ds = xr.open_zarr(path)
+        out = ds
+        dim = "time"
+        if "time" not in ds.dims:
+            dim = "granule"
+            out = _drop_layout_encoding(ds.expand_dims(dim))
+        if zarr_exists(target):
+            out.to_zarr(target, mode="a", append_dim=dim)
+        else:
+            # Granules often encode time as integer "days since <start>"; later
+            # appends reuse the store's encoding, so pin a fine-grained one here.
+            encoding = {"time": {"units": TIME_UNITS, "dtype": "int64"}} if "time" in out.coords else None
+            out.to_zarr(target, mode="w", encoding=encoding)
+        if analysis:
+            append_analysis(analysis, ds)
+
+
+def timeseries_name(zarr_name: str) -> str:
+    return f"{zarr_name}_ts"
+
+
+def _time_chunks(offset: int, n: int, size: int) -> Tuple[int, ...]:
+    # Dask chunks for `n` steps written at `offset` that line up with zarr chunks of
+    # `size`, so no two dask chunks write into the same (partial) zarr chunk
+    head = min(n, (size - offset % size) % size or size)
+    rest = n - head
+    return (head,) + (size,) * (rest // size) + ((rest % size,) if rest % size else ())
+
+
+def write_timeseries_layout(zarr_name: str) -> str:
+    """Mirror `zarr_name` as `<zarr_name>_ts` with long time and small spatial chunks,
+    so reading one pixel's history touches a handful of chunks instead of every one.
+
+    The source only grows along time, so once the layout exists just the steps
+    appended since the last refresh are written; anything else is a full rewrite.
+    """
+    source = get_zarr_target(zarr_name, partitioned=False)
+    target = get_zarr_target(timeseries_name(zarr_name), partitioned=False)
+    ds = xr.open_zarr(source)
+    size = max(1, settings.timeseries_time_chunk)
+    spec = chunk_spec(ds, settings.timeseries_spatial_chunk)
+    if "time" in ds.dims and zarr_exists(target):
+        written = xr.open_zarr(target).sizes.get("time")
+        if written is not None and written <= ds.sizes["time"]:
+            new = ds.isel(time=slice(written, None))
+            if new.sizes["time"]:
+                spec["time"] = _time_chunks(written, new.sizes["time"], size)
+                _drop_layout_encoding(new.chunk(spec)).to_zarr(target, mode="a", append_dim="time")
+            return target
+    if "time" in ds.dims:
+        spec["time"] = _time_chunks(0, ds.sizes["time"], size)
+    ds = _drop_layout_encoding(ds.chunk(spec))
+    for var in ds.data_vars.values():
+        if "time" in var.dims:
+            # Fix the time chunk up front so a short first refresh doesn't set it
+            var.encoding["chunks"] = tuple(size if d == "time" else c[0] for d, c in zip(var.dims, var.chunks))
+    ds.to_zarr(target, mode="w")
+    return target
+
+
+def open_timeseries(zarr_name: str) -> xr.Dataset:
+    """Open the time-series layout of `zarr_name` when present, else the map layout."""
+    ts = get_zarr_target(timeseries_name(zarr_name), partitioned=False)
+    if zarr_exists(ts):
+        return xr.open_zarr(ts)
+    return xr.open_zarr(get_zarr_target(zarr_name, partitioned=False))
+
+
+async def download_granule(granule) -> List[str]:
+    """Return local files for `granule`, downloading into the granule cache on a miss."""
+    key = granule_cache.granule_key(granule)
+    cached = granule_cache.lookup(key)
+    if cached:
+        return cached
+    dest = granule_cache.entry_dir(key)
+    files = await asyncio.to_thread(earthaccess.download, [granule], local_path=str(dest), threads=1)
+    if not files:
+        return []
+    granule_cache.commit(key)
+    return [str(f) for f in files]
+
+
+async def ingest_granules(
+    results: Sequence,
+    select: Selector,
+    zarr_name: str,
+    concurrency: Optional[int] = None,
+    timeseries: Optional[bool] = None,
+    analysis: Optional[str] = None,
+) -> int:
+    """Download every granule in `results` concurrently, convert each NetCDF file to a
+    staging Zarr in the process pool and append them along time to `zarr_name`.
+
+    Granules recorded in the store's ledger are skipped, so repeated or overlapping
+    time ranges only fetch and convert what is new. With `timeseries` (default
+    TIMESERIES_LAYOUT) the pixel-history layout is extended after the append. With
+    `analysis` every new granule is also regridded into that source's analysis store.
+    """
+    target = get_zarr_target(zarr_name, partitioned=False)
+    if not zarr_exists(target):
+        # The ledger describes the store's contents; start over if it was removed
+        reset_ledger(zarr_name)
+    ledger = get_ledger(zarr_name)
+    keys = [granule_cache.granule_key(g) for g in results]
+    pending = [(k, g) for k, g in zip(keys, results) if k not in ledger]
+    if not pending:
+        return 0
+    if earthaccess is None:
+        raise ImportError("earthaccess not installed")
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    sem = asyncio.Semaphore(max(1, concurrency or settings.earthdata_download_concurrency))
+    work = Path(tempfile.mkdtemp(prefix=f"{zarr_name}-"))
+    done = 0
+
+    async def _one(i: int, granule) -> Tuple[int, List[str]]:
+        nonlocal done
+        async with sem:
+            files = await download_granule(granule)
+        count = 0
+        staged = []
+        for j, f in enumerate(files):
+            out = str(work / "zarr" / f"{i}-{j}.zarr")
+            n = await loop.run_in_executor(pool, _convert_granule, f, out, select)
+            if n:
+                count += n
+                staged.append(out)
+        done += 1
+        await asyncio.to_thread(report_progress, granules_done=done, granules_total=len(pending))
+        return count, staged
+
+    try:
+        parts = await asyncio.gather(*[_one(i, g) for i, (_, g) in enumerate(pending)])
+        staged = [p for _, paths in parts for p in paths]
+        if staged:
+            await asyncio.to_thread(_append_staged, staged, target, analysis)
+            if settings.timeseries_layout if timeseries is None else timeseries:
+                await asyncio.to_thread(write_timeseries_layout, zarr_name)
+        record_ingested(zarr_name, [k for k, _ in pending])
+        return sum(n for n, _ in parts)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+        await asyncio.to_thread(granule_cache.evict, None, [k for k, _ in pending])
@@ -7,19 +7,14 @@ try:
 except Exception:  # pragma: no cover
     shap = None
 
-from services.model_xgb import load_model
+from services.model_xgb import feature_row, load_model_and_schema
 
 
 def explain_xgb(features: Dict[str, Any]) -> dict:
-    model = load_model()
+    model, schema = load_model_and_schema()
     if model is None or shap is None:
         return {"explainable": False}
-    lat = float(features.get("lat", 0.0))
-    lon = float(features.get("lon", 0.0))
-    param_id = float(features.get("parameter_id", 0.0))
-    hour = float(features.get("hour", 12.0))
-    weekday = float(features.get("weekday", 3.0))
-    X = np.array([[lat, lon, param_id, hour, weekday]], dtype=float)
+    X, names = feature_row(features, schema)
     explainer = shap.Explainer(model)
     sv = explainer(X)
     values = sv.values[0].tolist() if hasattr(sv, 'values') else []
@@ -28,5 +23,5 @@ def explain_xgb(features: Dict[str, Any]) -> dict:
         "explainable": True,
         "base_value": base,
         "shap_values": values,
-        "features": ["lat","lon","parameter_id","hour","weekday"],
+        "features": names,
     }
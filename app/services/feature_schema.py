@@ -0,0 +1,64 @@
+from __future__ import annotations
+import json
+from pathlib import Path
+from typing import Optional, Sequence
+import numpy as np
+import pandas as pd
+
+SCHEMA_VERSION = 1
+
+
+class FeatureSchema:
+    """Feature columns and parameter vocabulary a model was trained with.
+
+    Saved with the model so inference encodes exactly like training did:
+    parameter ids are positions in the sorted vocabulary, unknown names map to -1.
+    """
+
+    def __init__(self, features: Sequence[str], parameters: Sequence[str]) -> None:
+        self.features = list(features)
+        self.parameters = np.array(sorted({str(p) for p in parameters}), dtype=str)
+        self._index = pd.Index(self.parameters.tolist())
+
+    @staticmethod
+    def _names(params: np.ndarray) -> pd.Series:
+        # Through pandas: zarr v3 returns strings as StringDType, which numpy
+        # cannot cast to its fixed-width str dtype
+        return pd.Series(np.asarray(params).ravel()).astype(str)
+
+    @classmethod
+    def fit(cls, features: Sequence[str], params: np.ndarray) -> "FeatureSchema":
+        return cls(features, cls._names(params).unique())
+
+    def encode_parameters(self, params: np.ndarray) -> np.ndarray:
+        """Vectorized name -> id lookup; names outside the vocabulary map to -1."""
+        codes = self._index.get_indexer(self._names(params))
+        codes[codes < 0] = -1
+        return codes.reshape(np.shape(params)).astype(float)
+
+    def parameter_id(self, name: Optional[str]) -> float:
+        if name is None:
+            return -1.0
+        return float(self.encode_parameters(np.array([name]))[0])
+
+    def validate(self, n_columns: int) -> None:
+        if n_columns != len(self.features):
+            raise ValueError(
+                f"Feature matrix has {n_columns} columns but the model expects {len(self.features)}: {self.features}"
+            )
+
+    def to_dict(self) -> dict:
+        return {"version": SCHEMA_VERSION, "features": self.features, "parameters": self.parameters.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FeatureSchema":
+        if data.get("version") != SCHEMA_VERSION:
+            raise ValueError(f"Unsupported feature schema version: {data.get('version')}")
+        return cls(data["features"], data.get("parameters", []))
+
+    def save(self, path: str) -> None:
+        Path(path).write_text(json.dumps(self.to_dict()))
+
+    @classmethod
+    def load(cls, path: str) -> "FeatureSchema":
+        return cls.from_dict(json.loads(Path(path).read_text()))
@@ -0,0 +1,275 @@
+from __future__ import annotations
+import asyncio
+import re
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import xarray as xr
+
+from config import settings
+from services.model_registry import registry
+from services.regrid import ANALYSIS_SOURCES, analysis_name
+from services.storage import get_zarr_target, list_partitions, partition_groups, store_lock, string_values, time_encoding, zarr_exists
+
+FEATURE_STORE = "features"
+LATEST_STORE = "features_latest"
+# Observation stores the feature store is built from; both name the station `location`
+OBS_STORES = ("openaq_measurements", "airnow_measurements")
+BASE_FEATURES = ["lat", "lon", "parameter_id", "hour", "weekday"]
+_EXOG_PREFIXES = tuple(f"{s}_" for s in ANALYSIS_SOURCES)
+
+
+def exog_columns(names) -> List[str]:
+    """Gridded (analysis cube) feature columns among `names`."""
+    return sorted(str(n) for n in names if str(n).startswith(_EXOG_PREFIXES))
+
+
+def _nearest(axis: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """Index of the nearest `axis` element (axis sorted ascending) for each value."""
+    if axis.size == 1:
+        return np.zeros(values.shape, dtype=int)
+    i = np.clip(np.searchsorted(axis, values), 1, axis.size - 1)
+    left = axis[i - 1]
+    right = axis[i]
+    return np.where(np.abs(values - left) <= np.abs(right - values), i - 1, i)
+
+
+def sample_store(ds: xr.Dataset, lat: np.ndarray, lon: np.ndarray, times: np.ndarray) -> Dict[str, np.ndarray]:
+    """Nearest-cell, nearest-time values of every variable in one analysis store for
+    all points at once. Points off the grid or further than FEATURE_TIME_TOLERANCE_HOURS
+    from any step are NaN."""
+    glat = ds["lat"].values
+    glon = ds["lon"].values
+    yi = _nearest(glat, lat)
+    xi = _nearest(glon, lon)
+    half = settings.analysis_grid_res / 2
+    ok = (np.abs(glat[yi] - lat) <= half) & (np.abs(glon[xi] - lon) <= half)
+    idx = {"lat": xr.DataArray(yi, dims="point"), "lon": xr.DataArray(xi, dims="point")}
+    if "time" in ds.dims:
+        gtime = ds["time"].values.astype("datetime64[s]").astype("int64")
+        order = np.argsort(gtime)
+        t = times.astype("datetime64[s]").astype("int64")
+        ti = order[_nearest(gtime[order], t)]
+        ok &= np.abs(gtime[ti] - t) <= settings.feature_time_tolerance_hours * 3600
+        idx["time"] = xr.DataArray(ti, dims="point")
+    out = {}
+    for name, da in ds.data_vars.items():
+        if not {"lat", "lon"} <= set(da.dims):
+            continue
+        values = np.asarray(da.isel({d: i for d, i in idx.items() if d in da.dims}).values, dtype=float)
+        out[str(name)] = np.where(ok, values, np.nan)
+    return out
+
+
+def sample_gridded(lat: np.ndarray, lon: np.ndarray, times: np.ndarray) -> Dict[str, np.ndarray]:
+    """Sample every analysis store present at the given points."""
+    out: Dict[str, np.ndarray] = {}
+    if lat.size == 0:
+        return out
+    for source in ANALYSIS_SOURCES:
+        target = get_zarr_target(analysis_name(source), partitioned=False)
+        if not zarr_exists(target):
+            continue
+        ds = xr.open_zarr(target)
+        try:
+            out.update(sample_store(ds, lat, lon, times))
+        finally:
+            ds.close()
+    return out
+
+
+def build_features(obs: pd.DataFrame, station_col: str = "location") -> pd.DataFrame:
+    """Join observations (datetime/latitude/longitude/parameter/value) with the
+    gridded stores sampled at each station and time."""
+    times = pd.to_datetime(obs["datetime"], utc=True).dt.tz_localize(None).to_numpy()
+    lat = obs["latitude"].astype(float).to_numpy()
+    lon = obs["longitude"].astype(float).to_numpy()
+    frame = pd.DataFrame(
+        {
+            "datetime": times,
+            "location": obs[station_col].astype(str).to_numpy() if station_col in obs else "",
+            "parameter": obs["parameter"].astype(str).to_numpy(),
+            "lat": lat,
+            "lon": lon,
+            "value": pd.to_numeric(obs["value"], errors="coerce").to_numpy(),
+        }
+    )
+    stamps = times.astype("datetime64[s]")
+    frame["hour"] = (stamps.astype("datetime64[h]") - stamps.astype("datetime64[D]")).astype(int)
+    # 1970-01-01 was a Thursday; shift so Monday == 0 like datetime.weekday()
+    frame["weekday"] = (stamps.astype("datetime64[D]").astype("int64") + 3) % 7
+    for name, values in sample_gridded(lat, lon, times).items():
+        frame[name] = values
+    return frame
+
+
+def _feature_dataset(frame: pd.DataFrame) -> xr.Dataset:
+    data = {c: ("obs", frame[c].to_numpy(dtype=float)) for c in ["value", "hour", "weekday", *exog_columns(frame.columns)]}
+    return xr.Dataset(
+        data,
+        coords={
+            "obs": np.arange(len(frame)),
+            "time": ("obs", frame["datetime"].to_numpy()),
+            "lat": ("obs", frame["lat"].to_numpy()),
+            "lon": ("obs", frame["lon"].to_numpy()),
+            "parameter": ("obs", string_values(frame["parameter"])),
+            "location": ("obs", string_values(frame["location"])),
+        },
+    )
+
+
+def _newest(obs: pd.DataFrame, station_col: str) -> pd.DataFrame:
+    station = obs[station_col].astype(str) if station_col in obs else pd.Series("", index=obs.index)
+    order = pd.to_datetime(obs["datetime"], utc=True)
+    keep = pd.DataFrame({"t": order, "s": station, "p": obs["parameter"].astype(str)})
+    keep = keep.sort_values("t").drop_duplicates(["s", "p"], keep="last")
+    return obs.loc[keep.index]
+
+
+def update_latest_features(obs: pd.DataFrame, station_col: str = "location") -> None:
+    """Fold the newest observation per station/parameter into LATEST_STORE, which fills
+    gridded features at inference time. The table is rewritten whole, so ingests call
+    this once per run rather than per page."""
+    if obs.empty:
+        return
+    frame = build_features(_newest(obs, station_col), station_col)
+    target = get_zarr_target(LATEST_STORE, partitioned=False)
+    # OpenAQ and AirNow both update it: the read-merge-rewrite must not interleave
+    with store_lock(LATEST_STORE):
+        if zarr_exists(target):
+            with xr.open_zarr(target) as ds:
+                prev = ds.reset_coords().to_dataframe().reset_index(drop=True).rename(columns={"time": "datetime"})
+            frame = pd.concat([prev, frame], ignore_index=True)
+        frame = frame.sort_values("datetime").drop_duplicates(["location", "parameter"], keep="last")
+        _feature_dataset(frame.reset_index(drop=True)).to_zarr(target, mode="w")
+
+
+def append_features(obs: pd.DataFrame, station_col: str = "location") -> int:
+    """Feature-store stage: materialise features for newly ingested observations and
+    append them to the day partitions of FEATURE_STORE. Callers hold the lock of the
+    observation store the rows came from (see backfill_features)."""
+    if obs.empty:
+        return 0
+    frame = build_features(obs, station_col)
+    # OpenAQ and AirNow jobs both append here
+    with store_lock(FEATURE_STORE):
+        for day, idx in partition_groups(frame):
+            target = get_zarr_target(FEATURE_STORE, partitioned=True, dt=day)
+            ds = _feature_dataset(frame.iloc[idx])
+            if zarr_exists(target):
+                with xr.open_zarr(target) as existing:
+                    columns = set(existing.data_vars)
+                # A partition keeps the columns it was created with; new gridded
+                # sources show up from the next partition on
+                ds = ds.drop_vars([v for v in ds.data_vars if v not in columns])
+                for v in columns - set(ds.data_vars):
+                    ds[v] = ("obs", np.full(ds.sizes["obs"], np.nan))
+                ds.to_zarr(target, mode="a", append_dim="obs")
+            else:
+                ds.to_zarr(target, mode="w", encoding=time_encoding(ds))
+    return len(frame)
+
+
+def _partition_days(name: str) -> List[datetime]:
+    days = []
+    for path in list_partitions(name):
+        m = re.search(r"year=(\d+)/month=(\d+)/day=(\d+)\.zarr$", path.replace("\\", "/"))
+        if m:
+            days.append(datetime(*map(int, m.groups())))
+    return days
+
+
+def _read_obs(target: str) -> pd.DataFrame:
+    with xr.open_zarr(target) as ds:
+        df = ds[["value"]].reset_coords().to_dataframe().reset_index(drop=True)
+    return df.rename(columns={"time": "datetime", "lat": "latitude", "lon": "longitude"})
+
+
+def backfill_features(days: Optional[int] = None) -> dict:
+    """Rebuild FEATURE_STORE (last `days` days, all when None) and LATEST_STORE from the
+    observation stores, e.g. for data ingested before the feature store existed. Each
+    day partition is rewritten whole, so a rerun does not duplicate rows."""
+    all_days = sorted({d for name in OBS_STORES for d in _partition_days(name)})
+    if days:
+        all_days = all_days[-days:]
+    rows = 0
+    newest = []
+    for day in all_days:
+        with ExitStack() as locks:
+            # Same order as ingest (observations, then features): an ingest of this day
+            # either lands before the rebuild reads it or appends after it is written
+            for name in (*OBS_STORES, FEATURE_STORE):
+                locks.enter_context(store_lock(name))
+            targets = [get_zarr_target(name, partitioned=True, dt=day) for name in OBS_STORES]
+            frames = [_read_obs(t) for t in targets if zarr_exists(t)]
+            obs = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            if obs.empty:
+                continue
+            ds = _feature_dataset(build_features(obs))
+            ds.to_zarr(get_zarr_target(FEATURE_STORE, partitioned=True, dt=day), mode="w", encoding=time_encoding(ds))
+        rows += len(obs)
+        newest.append(_newest(obs, "location"))
+    if newest:
+        update_latest_features(pd.concat(newest, ignore_index=True))
+    return {"days": len(all_days), "rows": rows}
+
+
+async def backfill_features_job(days: Optional[int] = None) -> dict:
+    return await asyncio.to_thread(backfill_features, days)
+
+
+def _load_latest(target: str) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+    with xr.open_zarr(target) as ds:
+        cols = exog_columns(ds.data_vars)
+        return ds["lat"].values, ds["lon"].values, {c: ds[c].values for c in cols}
+
+
+def _latest_table() -> Optional[Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]]:
+    target = get_zarr_target(LATEST_STORE, partitioned=False)
+    if not zarr_exists(target):
+        return None
+    # Local stores are cached until rewritten; remote ones are read each time
+    return _load_latest(target) if target.startswith("s3://") else registry.get(target, _load_latest)
+
+
+def nearest_station(lat: np.ndarray, lon: np.ndarray, s_lat: np.ndarray, s_lon: np.ndarray, max_km: float) -> np.ndarray:
+    """Row of the nearest station for each point, -1 when none is within `max_km`."""
+    p_lat, p_lon = np.radians(lat)[:, None], np.radians(lon)[:, None]
+    slat, slon = np.radians(s_lat)[None, :], np.radians(s_lon)[None, :]
+    a = np.sin((slat - p_lat) / 2) ** 2 + np.cos(p_lat) * np.cos(slat) * np.sin((slon - p_lon) / 2) ** 2
+    dist = 2 * 6371.0 * np.arcsin(np.sqrt(a))
+    i = np.argmin(dist, axis=1)
+    return np.where(dist[np.arange(i.size), i] <= max_km, i, -1)
+
+
+def latest_exog(lat: float, lon: float, max_km: float = 50.0) -> Dict[str, float]:
+    """Gridded features of the nearest station's latest feature row."""
+    table = _latest_table()
+    if table is None:
+        return {}
+    s_lat, s_lon, cols = table
+    if not cols or s_lat.size == 0:
+        return {}
+    i = int(nearest_station(np.array([lat]), np.array([lon]), s_lat, s_lon, max_km)[0])
+    if i < 0:
+        return {}
+    return {c: float(v[i]) for c, v in cols.items()}
+
+
+def latest_exog_many(lat: np.ndarray, lon: np.ndarray, names: List[str], max_km: float = 50.0) -> np.ndarray:
+    """(points x names) matrix of latest gridded features; NaN where unknown."""
+    out = np.full((lat.size, len(names)), np.nan)
+    table = _latest_table()
+    if table is None or not names:
+        return out
+    s_lat, s_lon, cols = table
+    if s_lat.size == 0:
+        return out
+    i = nearest_station(lat, lon, s_lat, s_lon, max_km)
+    found = i >= 0
+    for j, name in enumerate(names):
+        if name in cols:
+            out[found, j] = cols[name][i[found]]
+    return out
@@ -0,0 +1,97 @@
+from __future__ import annotations
+import hashlib
+import re
+import shutil
+import threading
+from pathlib import Path
+from typing import Iterable, List, Optional
+from config import settings
+from services.storage import ensure_dir
+
+# Downloaded granule files are kept under <cache>/<granule key>/ with a marker file
+# written once the download completed; the marker's mtime is the LRU timestamp.
+COMPLETE = ".complete"
+
+_lock = threading.Lock()
+
+
+def cache_dir() -> Path:
+    return Path(settings.granule_cache_dir or Path(settings.data_dir) / "granule_cache")
+
+
+def _checksum(granule) -> str:
+    umm = granule.get("umm", {}) if hasattr(granule, "get") else {}
+    infos = umm.get("DataGranule", {}).get("ArchiveAndDistributionInformation", []) or []
+    sums = [i.get("Checksum", {}).get("Value") for i in infos if i.get("Checksum")]
+    if sums:
+        return ",".join(sorted(s for s in sums if s))
+    meta = granule.get("meta", {}) if hasattr(granule, "get") else {}
+    return str(meta.get("revision-id") or umm.get("ProviderDates") or "")
+
+
+def granule_id(granule) -> str:
+    meta = granule.get("meta", {}) if hasattr(granule, "get") else {}
+    umm = granule.get("umm", {}) if hasattr(granule, "get") else {}
+    gid = meta.get("concept-id") or umm.get("GranuleUR")
+    if gid:
+        return str(gid)
+    return hashlib.sha1(repr(granule).encode()).hexdigest()
+
+
+def granule_key(granule) -> str:
+    """Stable key for one revision of a granule: its ID plus a digest of its checksums."""
+    gid = re.sub(r"[^A-Za-z0-9._-]", "_", granule_id(granule))
+    digest = hashlib.sha1(_checksum(granule).encode()).hexdigest()[:12]
+    return f"{gid}-{digest}"
+
+
+def lookup(key: str) -> Optional[List[str]]:
+    entry = cache_dir() / key
+    marker = entry / COMPLETE
+    if not marker.exists():
+        return None
+    marker.touch()
+    return sorted(str(p) for p in entry.iterdir() if p.name != COMPLETE)
+
+
+def entry_dir(key: str) -> Path:
+    """Fresh directory to download `key` into; call `commit` once the download is done."""
+    entry = cache_dir() / key
+    shutil.rmtree(entry, ignore_errors=True)
+    ensure_dir(entry)
+    return entry
+
+
+def commit(key: str) -> None:
+    (cache_dir() / key / COMPLETE).touch()
+
+
+def _entry_size(entry: Path) -> int:
+    return sum(f.stat().st_size for f in entry.rglob("*") if f.is_file())
+
+
+def evict(max_bytes: Optional[int] = None, keep: Iterable[str] = ()) -> int:
+    """Drop least recently used entries until the cache fits in `max_bytes`."""
+    limit = int(settings.granule_cache_max_gb * 1024 ** 3) if max_bytes is None else max_bytes
+    root = cache_dir()
+    if not root.exists():
+        return 0
+    keep = set(keep)
+    removed = 0
+    with _lock:
+        entries = []
+        for entry in root.iterdir():
+            marker = entry / COMPLETE
+            if not entry.is_dir() or not marker.exists():
+                continue
+            entries.append((marker.stat().st_mtime, entry, _entry_size(entry)))
+        total = sum(size for _, _, size in entries)
+        for _, entry, size in sorted(entries, key=lambda e: e[0]):
+            if total <= limit:
+                break
+            if entry.name in keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+    return removed
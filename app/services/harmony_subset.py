@@ -1,27 +1,106 @@
 from __future__ import annotations
-from typing import Optional
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from config import settings
+from services.tiling import split_bbox, split_time_range
 
 try:
     from harmony import Client
 except Exception:  # pragma: no cover
     Client = None
 
+# Anything with submit(collection=, spatial=, temporal=, format=), result_json(req)
+# and download_url(url, path); tests pass a local stand-in instead of harmony.Client
+ClientFactory = Callable[[], Any]
+
 
-def subset_harmony(collection: str, bbox: Optional[str], time_range: Optional[str], output: str) -> dict:
+def _default_client() -> Any:
     if Client is None:
         raise RuntimeError("harmony-py not installed")
-    client = Client()
+    return Client()
+
+
+def data_links(resp: dict) -> List[str]:
+    return [i.get('href') for i in resp.get('links', []) if i.get('rel') == 'data' and i.get('href')]
+
+
+def _submit(client: Any, collection: str, bbox: Optional[str], time_range: Optional[str]) -> List[str]:
     req = client.submit(
         collection=collection,
         spatial=bbox,
         temporal=time_range,
         format="netcdf4"
     )
-    resp = client.result_json(req)
-    # Download first item
-    hrefs = [i.get('href') for i in resp.get('links', []) if i.get('rel') == 'data']
+    return data_links(client.result_json(req))
+
+
+def _download_all(client: Any, jobs: List[Tuple[str, str]], concurrency: int) -> List[str]:
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(jobs)))) as pool:
+        list(pool.map(lambda j: client.download_url(j[0], j[1]), jobs))
+    return [path for _, path in jobs]
+
+
+def subset_harmony(
+    collection: str,
+    bbox: Optional[str],
+    time_range: Optional[str],
+    output: str,
+    client: Any = None,
+) -> dict:
+    client = client or _default_client()
+    hrefs = _submit(client, collection, bbox, time_range)
     if not hrefs:
         return {"downloaded": 0}
-    first = hrefs[0]
-    client.download_url(first, output)
-    return {"downloaded": 1, "file": output}
+    # First link keeps the requested name, the rest get a numeric suffix
+    stem, ext = os.path.splitext(output)
+    paths = [output] + [f"{stem}_{i}{ext}" for i in range(1, len(hrefs))]
+    files = _download_all(client, list(zip(hrefs, paths)), settings.harmony_concurrency)
+    return {"downloaded": len(files), "file": files[0], "files": files}
+
+
+async def subset_harmony_tiled(
+    collection: str,
+    bbox: Optional[str],
+    time_range: Optional[str],
+    workdir: Path,
+    tile_deg: Optional[float] = None,
+    time_step_hours: Optional[float] = None,
+    concurrency: Optional[int] = None,
+    client_factory: Optional[ClientFactory] = None,
+) -> List[str]:
+    """Submit one Harmony request per bbox/time tile in parallel and download every
+    result link into `workdir`. Returns the downloaded file paths.
+
+    Submits and downloads share one `concurrency` limit, so at most that many
+    Harmony requests are in flight however many links each tile returns.
+    """
+    tile_deg = settings.harmony_tile_deg if tile_deg is None else tile_deg
+    time_step_hours = settings.harmony_time_step_hours if time_step_hours is None else time_step_hours
+    concurrency = concurrency or settings.harmony_concurrency
+    client = (client_factory or _default_client)()
+
+    bboxes = split_bbox(bbox, tile_deg) if bbox and tile_deg > 0 else [bbox]
+    windows = split_time_range(time_range, time_step_hours)
+    tiles = [(b, t) for t in windows for b in bboxes]
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _request(fn: Callable[..., Any], *args: Any) -> Any:
+        async with sem:
+            return await asyncio.to_thread(fn, *args)
+
+    async def _tile(i: int, tile_bbox: Optional[str], window: Optional[str]) -> List[str]:
+        hrefs = await _request(_submit, client, collection, tile_bbox, window)
+        jobs = [
+            (href, str(workdir / f"{i:04d}_{j:03d}_{Path(urlparse(href).path).name or 'subset.nc'}"))
+            for j, href in enumerate(hrefs)
+        ]
+        await asyncio.gather(*(_request(client.download_url, href, path) for href, path in jobs))
+        return [path for _, path in jobs]
+
+    results = await asyncio.gather(*(_tile(i, b, t) for i, (b, t) in enumerate(tiles)))
+    return [path for paths in results for path in paths]
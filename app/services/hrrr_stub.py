@@ -3,6 +3,7 @@ import numpy as np
 import xarray as xr
 from datetime import datetime, timedelta, timezone
 from services.storage import get_zarr_target
+from services.regrid import append_analysis
 
 
 async def ingest_hrrr_stub() -> int:
@@ -28,4 +29,5 @@ async def ingest_hrrr_stub() -> int:
     )
     target = get_zarr_target("hrrr_latest", partitioned=False)
     ds.to_zarr(target, mode="w")
+    append_analysis("hrrr", ds)
     return int(T2M.size)
@@ -0,0 +1,87 @@
+from __future__ import annotations
+import asyncio
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+import httpx
+from config import settings
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Shared AsyncClient so concurrent ingests reuse pooled connections.
+
+    httpx clients are bound to the event loop they were first used on, so a new
+    client is created whenever we are called from a different loop.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        limits = httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_connections,
+        )
+        _client = httpx.AsyncClient(timeout=60, limits=limits)
+        _client_loop = loop
+    return _client
+
+
+async def close_async_client() -> None:
+    global _client, _client_loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def retry_after_seconds(value: Optional[str]) -> float:
+    """Delay asked for by a Retry-After header, either seconds or an HTTP date;
+    0 when absent or unparseable, so the computed backoff applies."""
+    if not value:
+        return 0.0
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return 0.0
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+async def get_with_retry(
+    client: httpx.AsyncClient,
+    url: str,
+    params: Optional[dict] = None,
+    timeout: float = 60,
+    retries: Optional[int] = None,
+    backoff: Optional[float] = None,
+) -> Any:
+    """GET `url` and return the decoded JSON, retrying transport errors, 429 and 5xx
+    with exponential backoff plus jitter (honouring Retry-After when sent).
+    """
+    retries = settings.http_max_retries if retries is None else retries
+    backoff = settings.http_backoff_seconds if backoff is None else backoff
+    attempt = 0
+    while True:
+        try:
+            r = await client.get(url, params=params, timeout=timeout)
+            if r.status_code not in RETRY_STATUS or attempt >= retries:
+                r.raise_for_status()
+                return r.json()
+            delay = retry_after_seconds(r.headers.get("Retry-After"))
+        except httpx.TransportError:
+            if attempt >= retries:
+                raise
+            delay = 0.0
+        delay = max(delay, backoff * (2 ** attempt)) + random.uniform(0, backoff)
+        attempt += 1
+        await asyncio.sleep(delay)
@@ -1,21 +1,9 @@
 from __future__ import annotations
-from typing import Optional, List
+import asyncio
+from typing import Optional
 import xarray as xr
-import numpy as np
 
-try:
-    import earthaccess
-except Exception:  # pragma: no cover
-    earthaccess = None
-
-from config import settings
-from services.storage import get_zarr_target
-
-
-def _ensure_login() -> None:
-    if earthaccess is None:
-        raise ImportError("earthaccess not installed")
-    earthaccess.login(strategy="netrc", persist=True)
+from services.earthdata import ensure_login, ingest_granules, search_granules
 
 
 def _search_imerg(product: Optional[str], time_range: Optional[str]):
@@ -25,17 +13,10 @@ def _search_imerg(product: Optional[str], time_range: Optional[str]):
     }
     if time_range:
         query["temporal"] = time_range
-    return earthaccess.search_data(**query)
-
+    return search_granules(**query)
 
-def _download_first(results) -> List[str]:
-    if not results:
-        return []
-    return earthaccess.download(results[:1], quiet=True)
 
-
-def _nc_to_zarr(nc_path: str, zarr_name: str) -> int:
-    ds = xr.open_dataset(nc_path, engine="netcdf4")
+def _select_imerg_vars(ds: xr.Dataset) -> Optional[xr.Dataset]:
     # Try common IMERG precipitation variable names
     candidates = [
         "precipitationCal",  # final/gauge-corrected precipitation (mm/hr)
@@ -49,25 +30,14 @@ def _nc_to_zarr(nc_path: str, zarr_name: str) -> int:
     if var_name is None:
         # Fallback: take first data var
         if len(ds.data_vars) == 0:
-            return 0
+            return None
         var_name = list(ds.data_vars.keys())[0]
-    slim = ds[[var_name]]
     # Normalize variable name to 'precip' and keep coordinates
-    slim = slim.rename({var_name: "precip"})
-    target = get_zarr_target(zarr_name, partitioned=False)
-    slim.to_zarr(target, mode="w")
-    return int(slim["precip"].size)
+    return ds[[var_name]].rename({var_name: "precip"})
 
 
 async def ingest_imerg(product: Optional[str] = None, time_range: Optional[str] = None) -> int:
-    _ensure_login()
-    results = _search_imerg(product, time_range)
-    files = _download_first(results)
-    if not files:
-        return 0
-    count = 0
-    for f in files:
-        count += _nc_to_zarr(f, "imerg_latest")
-    return count
-
-
+    # earthaccess is blocking; keep it off the event loop
+    await asyncio.to_thread(ensure_login)
+    results = await asyncio.to_thread(_search_imerg, product, time_range)
+    return await ingest_granules(results, _select_imerg_vars, "imerg_latest", analysis="imerg")
@@ -0,0 +1,131 @@
+from __future__ import annotations
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Sequence
+import numpy as np
+import pandas as pd
+from config import settings
+from services.storage import ensure_dir, get_partition_suffix, partition_groups
+
+# Watermarks live in one small JSON file; seen keys are stored per source and day
+# partition as sorted uint64 hashes of (location, parameter, time), 8 bytes per row.
+STATE_DIR = Path(settings.data_dir) / "ingest_state"
+WATERMARKS = STATE_DIR / "watermarks.json"
+
+_lock = threading.Lock()
+
+
+def _load_watermarks() -> dict:
+    if not WATERMARKS.exists():
+        return {}
+    try:
+        return json.loads(WATERMARKS.read_text())
+    except Exception:
+        return {}
+
+
+def _atomic_write(path: Path, write) -> None:
+    ensure_dir(path.parent)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def get_watermark(key: str) -> Optional[datetime]:
+    value = _load_watermarks().get(key)
+    if not value:
+        return None
+    return pd.Timestamp(value).to_pydatetime()
+
+
+def set_watermark(key: str, dt: datetime) -> None:
+    """Advance the watermark for `key`; it never moves backwards."""
+    ts = pd.Timestamp(dt)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    with _lock:
+        marks = _load_watermarks()
+        current = marks.get(key)
+        if current and pd.Timestamp(current) >= ts:
+            return
+        marks[key] = ts.isoformat()
+        _atomic_write(WATERMARKS, lambda p: p.write_text(json.dumps(marks, indent=2)))
+
+
+def _ledger_path(name: str) -> Path:
+    return STATE_DIR / "ledger" / f"{name}.json"
+
+
+def get_ledger(name: str) -> dict:
+    """Granule keys already ingested into the store `name`, with ingestion time."""
+    path = _ledger_path(name)
+    if not path.exists():
+        return {}
+    try:
+        return json.loads(path.read_text())
+    except Exception:
+        return {}
+
+
+def record_ingested(name: str, keys: Sequence[str]) -> None:
+    if not keys:
+        return
+    now = pd.Timestamp.now(tz="UTC").isoformat()
+    with _lock:
+        ledger = get_ledger(name)
+        ledger.update({k: now for k in keys})
+        _atomic_write(_ledger_path(name), lambda p: p.write_text(json.dumps(ledger, indent=2)))
+
+
+def reset_ledger(name: str) -> None:
+    with _lock:
+        _ledger_path(name).unlink(missing_ok=True)
+
+
+def observation_keys(df: pd.DataFrame, key_cols: Sequence[str]) -> np.ndarray:
+    return pd.util.hash_pandas_object(df[list(key_cols)], index=False).to_numpy(dtype=np.uint64)
+
+
+def _seen_path(source: str, suffix: str) -> Path:
+    return STATE_DIR / source / f"{suffix}.npy"
+
+
+def _load_seen(source: str, suffix: str) -> np.ndarray:
+    path = _seen_path(source, suffix)
+    if not path.exists():
+        return np.array([], dtype=np.uint64)
+    return np.load(path)
+
+
+def drop_seen(source: str, df: pd.DataFrame, key_cols: Sequence[str], time_col: str = "datetime") -> pd.DataFrame:
+    """Drop rows already ingested into `source` as well as repeats within `df`."""
+    if df.empty:
+        return df
+    keys = observation_keys(df, key_cols)
+    keep = ~pd.Series(keys).duplicated().to_numpy()
+    for day, idx in partition_groups(df, time_col):
+        seen = _load_seen(source, get_partition_suffix(day))
+        if len(seen) == 0:
+            continue
+        k = keys[idx]
+        pos = np.minimum(np.searchsorted(seen, k), len(seen) - 1)
+        keep[idx] &= seen[pos] != k
+    return df[keep]
+
+
+def _save_keys(path: Path, keys: np.ndarray) -> None:
+    with path.open("wb") as f:
+        np.save(f, keys)
+
+
+def mark_seen(source: str, df: pd.DataFrame, key_cols: Sequence[str], time_col: str = "datetime") -> None:
+    if df.empty:
+        return
+    keys = observation_keys(df, key_cols)
+    with _lock:
+        for day, idx in partition_groups(df, time_col):
+            suffix = get_partition_suffix(day)
+            merged = np.union1d(_load_seen(source, suffix), keys[idx])
+            _atomic_write(_seen_path(source, suffix), lambda p: _save_keys(p, merged))
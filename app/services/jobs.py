@@ -0,0 +1,313 @@
+from __future__ import annotations
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import update
+from sqlmodel import SQLModel, Field, select
+from config import settings
+from db import get_session
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _aware(dt: Optional[datetime]) -> Optional[datetime]:
+    # SQLite hands datetimes back without tzinfo
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+class IngestJob(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    source: str = Field(index=True)
+    params: str = Field(default="{}")  # JSON kwargs for the ingest function
+    params_hash: str = Field(index=True)
+    status: str = Field(default=QUEUED, index=True)
+    progress: str = Field(default="{}")  # JSON, merged by report_progress
+    result: Optional[str] = Field(default=None)
+    error: Optional[str] = Field(default=None)
+    attempts: int = Field(default=0)
+    worker_id: Optional[str] = Field(default=None)
+    created_at: datetime = Field(default_factory=_utcnow)
+    started_at: Optional[datetime] = Field(default=None)
+    heartbeat_at: Optional[datetime] = Field(default=None)
+    finished_at: Optional[datetime] = Field(default=None)
+
+
+def _runners() -> Dict[str, Callable[..., Awaitable[Any]]]:
+    # Imported lazily: the ingest modules pull in xarray/earthaccess/harmony
+    from services.openaq import ingest_openaq_to_zarr
+    from services.airnow import ingest_airnow_to_zarr
+    from services.tempo_stub import ingest_tempo_stub
+    from services.tempo_harmony import ingest_tempo_harmony
+    from services.imerg import ingest_imerg
+    from services.merra2 import ingest_merra2
+    from services.pandora import ingest_pandora_csv
+    from services.training import train_lstm_job, train_xgb_job
+    from services.features import backfill_features_job
+    return {
+        "openaq": ingest_openaq_to_zarr,
+        "airnow": ingest_airnow_to_zarr,
+        "tempo": ingest_tempo_stub,
+        "tempo_harmony": ingest_tempo_harmony,
+        "imerg": ingest_imerg,
+        "merra2": ingest_merra2,
+        "pandora": ingest_pandora_csv,
+        # Model training; fitting itself runs in the training process pool
+        "train_xgb": train_xgb_job,
+        "train_lstm": train_lstm_job,
+        "backfill_features": backfill_features_job,
+    }
+
+
+def _params_hash(source: str, params: dict) -> str:
+    return hashlib.sha1(json.dumps([source, params], sort_keys=True, default=str).encode()).hexdigest()
+
+
+def job_to_dict(job: IngestJob) -> dict:
+    now = _utcnow()
+    created, started, finished = _aware(job.created_at), _aware(job.started_at), _aware(job.finished_at)
+    timing = {"queued_seconds": ((started or finished or now) - created).total_seconds()}
+    if started:
+        timing["run_seconds"] = ((finished or now) - started).total_seconds()
+    return {
+        "id": job.id,
+        "source": job.source,
+        "params": json.loads(job.params or "{}"),
+        "status": job.status,
+        "progress": json.loads(job.progress or "{}"),
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "attempts": job.attempts,
+        "created_at": created.isoformat(),
+        "started_at": started.isoformat() if started else None,
+        "finished_at": finished.isoformat() if finished else None,
+        "timing": timing,
+    }
+
+
+def enqueue(source: str, params: Dict[str, Any]) -> Tuple[IngestJob, bool]:
+    """Queue an ingest, or return the identical job already waiting (coalesced=True)."""
+    if source not in _runners():
+        raise ValueError(f"Unknown ingest source: {source}")
+    h = _params_hash(source, params)
+    with get_session() as s:
+        existing = s.exec(
+            select(IngestJob).where(IngestJob.params_hash == h, IngestJob.status == QUEUED)
+        ).first()
+        if existing is not None:
+            return existing, True
+        job = IngestJob(source=source, params=json.dumps(params, default=str), params_hash=h)
+        s.add(job)
+        s.commit()
+        s.refresh(job)
+        return job, False
+
+
+def get_job(job_id: int) -> Optional[IngestJob]:
+    with get_session() as s:
+        return s.get(IngestJob, job_id)
+
+
+def list_jobs(status: Optional[str] = None, source: Optional[str] = None, limit: int = 50) -> List[IngestJob]:
+    with get_session() as s:
+        q = select(IngestJob)
+        if status:
+            q = q.where(IngestJob.status == status)
+        if source:
+            q = q.where(IngestJob.source == source)
+        return list(s.exec(q.order_by(IngestJob.id.desc()).limit(limit)).all())
+
+
+def claim(sources: List[str], worker_id: str) -> Optional[IngestJob]:
+    """Atomically move the oldest queued job for one of `sources` to running."""
+    if not sources:
+        return None
+    with get_session() as s:
+        for _ in range(3):
+            job = s.exec(
+                select(IngestJob)
+                .where(IngestJob.status == QUEUED, IngestJob.source.in_(sources))
+                .order_by(IngestJob.id)
+            ).first()
+            if job is None:
+                return None
+            now = _utcnow()
+            res = s.execute(
+                update(IngestJob)
+                .where(IngestJob.id == job.id, IngestJob.status == QUEUED)
+                .values(status=RUNNING, worker_id=worker_id, started_at=now, heartbeat_at=now,
+                        attempts=IngestJob.attempts + 1)
+            )
+            s.commit()
+            if res.rowcount == 1:
+                s.refresh(job)
+                return job
+            # Another worker won the race; try the next one
+        return None
+
+
+def _update(job_id: int, **values) -> None:
+    with get_session() as s:
+        s.execute(update(IngestJob).where(IngestJob.id == job_id).values(**values))
+        s.commit()
+
+
+def finish(job_id: int, status: str, result: Any = None, error: Optional[str] = None) -> None:
+    _update(job_id, status=status, finished_at=_utcnow(),
+            result=json.dumps(result, default=str) if result is not None else None, error=error)
+
+
+def requeue_stale(max_age_seconds: Optional[int] = None) -> int:
+    """Return running jobs whose worker stopped heartbeating (crash/restart) to the queue."""
+    cutoff = _utcnow() - timedelta(seconds=max_age_seconds or settings.job_stale_seconds)
+    with get_session() as s:
+        res = s.execute(
+            update(IngestJob)
+            .where(IngestJob.status == RUNNING, IngestJob.heartbeat_at < cutoff)
+            .values(status=QUEUED, worker_id=None)
+        )
+        s.commit()
+        return res.rowcount or 0
+
+
+_current_job: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("current_job", default=None)
+
+
+def current_job_id() -> Optional[int]:
+    return _current_job.get()
+
+
+def bind_job(job_id: Optional[int]) -> None:
+    """Attribute report_progress calls in this context (e.g. a training subprocess) to `job_id`."""
+    _current_job.set(job_id)
+
+
+def report_progress(**info: Any) -> None:
+    """Merge `info` into the progress of the job running in this context, if any.
+    Safe to call from ingest code whether or not it runs as a job.
+    """
+    job_id = _current_job.get()
+    if job_id is None:
+        return
+    try:
+        with get_session() as s:
+            job = s.get(IngestJob, job_id)
+            if job is None:
+                return
+            progress = json.loads(job.progress or "{}")
+            progress.update(info)
+            job.progress = json.dumps(progress, default=str)
+            job.heartbeat_at = _utcnow()
+            s.add(job)
+            s.commit()
+    except Exception:
+        logger.exception("Failed to report progress for job %s", job_id)
+
+
+def _source_limits() -> Dict[str, int]:
+    limits: Dict[str, int] = {}
+    for part in settings.job_source_concurrency.split(","):
+        if "=" not in part:
+            continue
+        name, value = part.split("=", 1)
+        try:
+            limits[name.strip()] = max(1, int(value))
+        except ValueError:
+            continue
+    return limits
+
+
+class JobWorkerPool:
+    """Polls the job table and runs ingests with a global and per-source concurrency cap.
+
+    Runs in the worker process, which the API starts as a child by default
+    (JOB_WORKER_EMBEDDED); otherwise `python worker.py` must run alongside the API.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, limits: Optional[Dict[str, int]] = None) -> None:
+        self.max_concurrency = max(1, max_concurrency or settings.job_max_concurrency)
+        self.limits = limits if limits is not None else _source_limits()
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._running: Dict[str, int] = {}
+        self._tasks: set = set()
+        self._stop: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _free_sources(self, runners: Dict[str, Any]) -> List[str]:
+        if len(self._tasks) >= self.max_concurrency:
+            return []
+        return [src for src in runners if self._running.get(src, 0) < self.limits.get(src, 1)]
+
+    async def _heartbeat(self, job_id: int) -> None:
+        interval = max(1.0, settings.job_stale_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(_update, job_id, heartbeat_at=_utcnow())
+
+    async def _execute(self, job: IngestJob, runner: Callable[..., Awaitable[Any]]) -> None:
+        token = _current_job.set(job.id)
+        beat = asyncio.create_task(self._heartbeat(job.id))
+        try:
+            out = await runner(**json.loads(job.params or "{}"))
+            # Ingests return a record count, training jobs their metrics
+            result = out if isinstance(out, dict) else {"ingested_records": out}
+            await asyncio.to_thread(finish, job.id, SUCCEEDED, result)
+        except asyncio.CancelledError:
+            # Pool shutting down: hand the job back so the next worker reruns it
+            await asyncio.to_thread(_update, job.id, status=QUEUED, worker_id=None)
+            raise
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job.id, job.source)
+            await asyncio.to_thread(finish, job.id, FAILED, None, f"{type(e).__name__}: {e}")
+        finally:
+            beat.cancel()
+            _current_job.reset(token)
+            self._running[job.source] -= 1
+
+    async def run(self) -> None:
+        self._stop = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        runners = _runners()
+        await asyncio.to_thread(requeue_stale)
+        while not self._stop.is_set():
+            try:
+                job = await asyncio.to_thread(claim, self._free_sources(runners), self.worker_id)
+            except Exception:
+                logger.exception("Failed to claim ingest job")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stop.wait(), timeout=settings.job_poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self._running[job.source] = self._running.get(job.source, 0) + 1
+            task = asyncio.create_task(self._execute(job, runners[job.source]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stop(self) -> None:
+        """Ask `run` to return; running jobs are cancelled and handed back to the queue."""
+        if self._loop is not None and self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
@@ -1,9 +1,19 @@
 from __future__ import annotations
 import os
-from typing import Tuple
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Iterator, Optional, Tuple
 import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 import xarray as xr
 from datetime import datetime, timedelta, timezone
+from config import settings
+from services.jobs import report_progress
+from services.model_registry import current_version, new_version, prune_versions, registry, set_current_version, should_promote, write_version_info
+from services.station_buffer import recent_window
 from services.storage import get_model_path
 
 try:
@@ -12,52 +22,244 @@ except Exception as e:  # pragma: no cover
     tf = None
 
 LSTM_NAME = "lstm_aqi.keras"
+# Training runs are kept under MODEL_DIR/lstm_aqi_versions/<version>/
+VERSIONS_NAME = "lstm_aqi"
+LSTM_BATCH_SIZE = 64
 
 
-def _load_series_from_zarr(zarr_path: str) -> np.ndarray:
+def _load_series_from_zarr(zarr_path: str) -> Tuple[np.ndarray, np.ndarray]:
+    """All station series back to back in one float32 buffer, plus the start offset of
+    each series (and the end of the last). A station is a location/parameter pair, its
+    values ordered by time; stores without those coordinates are one series."""
     ds = xr.open_zarr(zarr_path)
     if "value" not in ds:
         raise ValueError("Dataset missing 'value' variable")
-    y = ds["value"].values.astype(float)
-    y = y[np.isfinite(y)]
-    return y
+    y = ds["value"].values.astype(np.float32)
+    # Integer codes are enough to group stations; pandas also reads the StringDType
+    # arrays zarr v3 returns, which numpy cannot cast to str
+    keys = [pd.factorize(pd.Series(ds[c].values).astype(str))[0] for c in ("parameter", "location") if c in ds.coords]
+    if "time" in ds.coords:
+        order = np.lexsort([ds["time"].values.astype("datetime64[s]").astype("int64"), *keys])
+    else:
+        order = np.arange(y.size)
+    ok = np.isfinite(y[order])
+    order = order[ok]
+    series = y[order]
+    if not keys:
+        return series, np.array([0, series.size])
+    station = np.zeros(order.size, dtype=bool)
+    for k in keys:
+        sk = k[order]
+        station[1:] |= sk[1:] != sk[:-1]
+    bounds = np.flatnonzero(station)
+    return series, np.concatenate([[0], bounds, [series.size]])
 
 
-def _make_sequences(series: np.ndarray, window: int = 24, horizon: int = 24) -> Tuple[np.ndarray, np.ndarray]:
-    X, Y = [], []
-    n = len(series)
-    if n < window + horizon + 1:
-        raise ValueError("Not enough samples for LSTM training")
-    for i in range(n - window - horizon):
-        X.append(series[i:i+window])
-        Y.append(series[i+window:i+window+horizon])
-    X = np.array(X, dtype=np.float32)[..., None]
-    Y = np.array(Y, dtype=np.float32)
-    return X, Y
+def _window_starts(offsets: np.ndarray, window: int, horizon: int, valid_fraction: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Start positions (into the series buffer) of every window that stays inside one
+    station, split per station in time: the newest `valid_fraction` of each station's
+    windows are for validation."""
+    train, valid = [], []
+    span = window + horizon
+    for a, b in zip(offsets[:-1], offsets[1:]):
+        n = int(b - a) - span + 1
+        if n <= 0:
+            continue
+        n_valid = int(n * valid_fraction)
+        starts = np.arange(a, a + n, dtype=np.int64)
+        train.append(starts[: n - n_valid])
+        valid.append(starts[n - n_valid:])
+    empty = np.empty(0, dtype=np.int64)
+    return (np.concatenate(train) if train else empty), (np.concatenate(valid) if valid else empty)
+
+
+def _batches(series: np.ndarray, starts: np.ndarray, window: int, horizon: int, batch_size: int, shuffle: bool = False) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """(X, Y) batches cut from a zero-copy sliding-window view of the series; only the
+    current batch is ever copied."""
+    windows = sliding_window_view(series, window + horizon)
+    if shuffle:
+        starts = np.random.permutation(starts)
+    for i in range(0, starts.size, batch_size):
+        batch = windows[starts[i:i + batch_size]]
+        yield batch[:, :window, None], batch[:, window:]
+
 
+def _dataset(series: np.ndarray, starts: np.ndarray, window: int, horizon: int, shuffle: bool) -> "tf.data.Dataset":
+    signature = (
+        tf.TensorSpec(shape=(None, window, 1), dtype=tf.float32),
+        tf.TensorSpec(shape=(None, horizon), dtype=tf.float32),
+    )
+    n_batches = -(-starts.size // LSTM_BATCH_SIZE)
+    ds = tf.data.Dataset.from_generator(
+        lambda: _batches(series, starts, window, horizon, LSTM_BATCH_SIZE, shuffle), output_signature=signature
+    )
+    # Known length lets Keras end epochs cleanly instead of running the generator dry
+    return ds.apply(tf.data.experimental.assert_cardinality(n_batches)).prefetch(tf.data.AUTOTUNE)
 
-def train_lstm_from_zarr(zarr_path: str, window: int = 24, horizon: int = 24, epochs: int = 5) -> dict:
+
+def _incumbent_mae(series: np.ndarray, starts: np.ndarray, window: int, horizon: int) -> float | None:
+    """Validation MAE of the served model on the new run's held-out windows, when its
+    window/horizon match."""
+    runner = load_lstm()
+    if runner is None or runner.window != window or runner.horizon != horizon:
+        return None
+    total = 0.0
+    for X, Y in _batches(series, starts, window, horizon, LSTM_BATCH_SIZE):
+        total += float(np.abs(runner.predict(X) - Y).sum())
+    return total / (starts.size * horizon)
+
+
+def train_lstm_from_zarr(zarr_path: str, window: int = 24, horizon: int = 24, epochs: int = 5, promote: str = "auto") -> dict:
+    """Fit on per-station windows streamed through tf.data, validate on each station's
+    newest TRAIN_VALID_FRACTION of windows and save the run as a new version; promoted
+    as for model_xgb._train."""
     if tf is None:
         raise RuntimeError("TensorFlow not installed")
-    series = _load_series_from_zarr(zarr_path)
-    X, Y = _make_sequences(series, window=window, horizon=horizon)
+    series, offsets = _load_series_from_zarr(zarr_path)
+    train_starts, valid_starts = _window_starts(offsets, window, horizon, settings.train_valid_fraction)
+    if train_starts.size == 0 or valid_starts.size == 0:
+        raise ValueError("Not enough samples for LSTM training")
     model = tf.keras.Sequential([
         tf.keras.layers.Input(shape=(window, 1)),
         tf.keras.layers.LSTM(64, return_sequences=False),
         tf.keras.layers.Dense(horizon)
     ])
     model.compile(optimizer="adam", loss="mae")
-    model.fit(X, Y, epochs=epochs, batch_size=64, verbose=0)
+    progress = tf.keras.callbacks.LambdaCallback(
+        on_epoch_end=lambda epoch, logs: report_progress(stage="fit", epoch=epoch + 1, epochs=epochs, **(logs or {}))
+    )
+    history = model.fit(
+        _dataset(series, train_starts, window, horizon, shuffle=True),
+        validation_data=_dataset(series, valid_starts, window, horizon, shuffle=False),
+        epochs=epochs,
+        shuffle=False,  # windows are shuffled by _batches
+        verbose=0,
+        callbacks=[progress],
+    )
+    metrics = {
+        "mae": float(history.history["val_loss"][-1]),
+        "train_mae": float(history.history["loss"][-1]),
+        "n_train": int(train_starts.size),
+        "n_test": int(valid_starts.size),
+        "stations": int(offsets.size - 1),
+        "window": window,
+        "horizon": horizon,
+    }
+    incumbent = _incumbent_mae(series, valid_starts, window, horizon) if promote == "auto" else None
+    promoted = should_promote(promote, metrics["mae"], incumbent)
+    version, vdir = new_version(VERSIONS_NAME)
+    model.save(vdir / "model.keras")
+    write_version_info(vdir, {"metrics": metrics, "incumbent_mae": incumbent, "promoted": promoted})
     model_path = get_model_path(LSTM_NAME)
-    model.save(model_path)
-    return {"model_path": str(model_path), "samples": int(len(X))}
+    if promoted:
+        registry.publish(str(model_path), _LSTMRunner(model), model.save)
+        set_current_version(VERSIONS_NAME, version)
+    prune_versions(VERSIONS_NAME, settings.model_keep_versions)
+    return {
+        "model_path": str(model_path),
+        "version": version,
+        "promoted": promoted,
+        "current_version": current_version(VERSIONS_NAME),
+        "incumbent_mae": incumbent,
+        "metrics": metrics,
+        "samples": int(train_starts.size + valid_starts.size),
+    }
+
+
+class _LSTMRunner:
+    """A loaded model with a traced predict function, warmed up at load time."""
+
+    def __init__(self, model) -> None:
+        self.model = model
+        self.window = int(model.input_shape[1])
+        self.horizon = int(model.output_shape[-1])
+        self._predict = tf.function(
+            lambda x: model(x, training=False),
+            input_signature=[tf.TensorSpec(shape=(None, self.window, 1), dtype=tf.float32)],
+        )
+        self.predict(np.zeros((1, self.window, 1), dtype=np.float32))
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self._predict(tf.convert_to_tensor(X, dtype=tf.float32)).numpy()
 
 
-def predict_lstm_timeline(lat: float, lon: float, horizon: int = 24, window: int = 24, baseline: float | None = None) -> dict:
+def _load_runner(path: str) -> _LSTMRunner:
+    return _LSTMRunner(tf.keras.models.load_model(path, compile=False))
+
+
+def load_lstm() -> Optional[_LSTMRunner]:
+    if tf is None:
+        return None
+    return registry.get(str(get_model_path(LSTM_NAME)), _load_runner)
+
+
+class _MicroBatcher:
+    """Coalesces concurrent predict calls into one model call: the first waiting request
+    holds the batch open for LSTM_BATCH_WAIT_MS or until LSTM_BATCH_MAX windows."""
+
+    def __init__(self) -> None:
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def predict(self, runner: _LSTMRunner, X: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="lstm-batcher", daemon=True)
+                self._thread.start()
+        future: Future = Future()
+        self._queue.put((runner, X, future))
+        return future.result()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        rows = len(batch[0][1])
+        deadline = time.monotonic() + settings.lstm_batch_wait_ms / 1000
+        while rows < settings.lstm_batch_max:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[1])
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            # A hot swap can put two model versions in one batch
+            groups: dict = {}
+            for item in batch:
+                groups.setdefault(id(item[0]), []).append(item)
+            for items in groups.values():
+                try:
+                    out = items[0][0].predict(np.concatenate([x for _, x, _ in items]))
+                except Exception as e:
+                    for _, _, future in items:
+                        future.set_exception(e)
+                    continue
+                i = 0
+                for _, x, future in items:
+                    future.set_result(out[i:i + len(x)])
+                    i += len(x)
+
+
+_batcher = _MicroBatcher()
+
+
+def predict_lstm_timeline(
+    lat: float, lon: float, horizon: int = 24, window: int = 24, baseline: float | None = None, parameter: str | None = None
+) -> dict:
+    """The input window is the nearest station's recent history (of `parameter`, if
+    given) from the rolling station buffer, or a flat window at `baseline` when no
+    station is near. `window` is only used by the fallback; a trained model defines its own."""
     now = datetime.now(timezone.utc)
-    times = [now + timedelta(hours=i) for i in range(horizon)]
-    model_path = get_model_path(LSTM_NAME)
-    if tf is None or not os.path.exists(model_path):
+    runner = load_lstm()
+    if runner is None:
+        times = [now + timedelta(hours=i) for i in range(horizon)]
         # Fallback: simple sinusoid baseline
         base = baseline if baseline is not None else 50.0
         mean = base + 20.0 * np.sin(np.linspace(0, 2*np.pi, horizon))
@@ -71,10 +273,13 @@ def predict_lstm_timeline(lat: float, lon: float, horizon: int = 24, window: int
             "upper": upper.tolist(),
             "model": "baseline"
         }
-    model = tf.keras.models.load_model(model_path)
-    # Build a synthetic input window around baseline (could be improved with real recent series)
-    seed = np.full((1, window, 1), fill_value=(baseline if baseline is not None else 50.0), dtype=np.float32)
-    pred = model.predict(seed, verbose=0)[0]
+    history = recent_window(lat, lon, runner.window, parameter)
+    if history is not None:
+        seed = history.reshape(1, runner.window, 1)
+    else:
+        seed = np.full((1, runner.window, 1), fill_value=(baseline if baseline is not None else 50.0), dtype=np.float32)
+    pred = _batcher.predict(runner, seed)[0][:horizon]
+    times = [now + timedelta(hours=i) for i in range(len(pred))]
     pred = np.clip(pred, 0, 500)
     spread = np.clip(0.12 * pred + 4.0, 4.0, 70.0)
     lower = np.clip(pred - spread, 0, 500)
@@ -84,5 +289,6 @@ def predict_lstm_timeline(lat: float, lon: float, horizon: int = 24, window: int
         "mean": pred.tolist(),
         "lower": lower.tolist(),
         "upper": upper.tolist(),
-        "model": "lstm"
+        "model": "lstm",
+        "history": "station" if history is not None else "baseline",
     }
@@ -0,0 +1,189 @@
+from __future__ import annotations
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import settings
+from services.storage import get_model_path
+
+# (mtime_ns, size) of the artifact a cached object was loaded from
+Version = Tuple[int, int]
+
+
+@dataclass
+class _Entry:
+    obj: Any
+    version: Version
+    loaded_at: float
+    load_seconds: float
+    hits: int = 0
+
+
+def _version(path: str) -> Optional[Version]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ModelRegistry:
+    """Process-wide cache of deserialized models keyed by artifact path.
+
+    A request only pays an os.stat; the artifact is loaded again when its mtime/size
+    changes. publish() writes through a temp file and os.replace, so readers in any
+    process see either the old or the new artifact, and this process switches to the
+    new object without reloading it.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._entries: Dict[str, _Entry] = {}
+        self._loads = 0
+        self._load_seconds = 0.0
+
+    def _path_lock(self, path: str) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(path, threading.Lock())
+
+    def get(self, path: str, loader: Callable[[str], Any]) -> Any | None:
+        version = _version(path)
+        if version is None:
+            self._entries.pop(path, None)
+            return None
+        entry = self._entries.get(path)
+        if entry is not None and entry.version == version:
+            entry.hits += 1
+            return entry.obj
+        # One loader per path; concurrent requests wait for it instead of loading too
+        with self._path_lock(path):
+            entry = self._entries.get(path)
+            if entry is not None and entry.version == version:
+                entry.hits += 1
+                return entry.obj
+            start = time.perf_counter()
+            obj = loader(path)
+            elapsed = time.perf_counter() - start
+            self._entries[path] = _Entry(obj=obj, version=version, loaded_at=time.time(), load_seconds=elapsed)
+            with self._lock:
+                self._loads += 1
+                self._load_seconds += elapsed
+            return obj
+
+    def publish(self, path: str, obj: Any, save: Callable[[str], None]) -> None:
+        """Save `obj` via `save(tmp_path)`, move it into place atomically and serve it."""
+        target = Path(path)
+        # Keep the suffix: some savers (Keras) pick the format from it
+        tmp = target.with_name(f".{target.stem}.{uuid.uuid4().hex[:8]}.tmp{target.suffix}")
+        with self._path_lock(path):
+            try:
+                save(str(tmp))
+                os.replace(tmp, target)
+            finally:
+                if tmp.exists():
+                    tmp.unlink()
+            version = _version(path)
+            if version is not None:
+                self._entries[path] = _Entry(obj=obj, version=version, loaded_at=time.time(), load_seconds=0.0)
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        if path is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(path, None)
+
+    def metrics(self) -> dict:
+        models = {
+            path: {
+                "version": f"{e.version[0]}-{e.version[1]}",
+                "loaded_at": e.loaded_at,
+                "load_seconds": round(e.load_seconds, 6),
+                "hits": e.hits,
+            }
+            for path, e in list(self._entries.items())
+        }
+        return {"loads": self._loads, "load_seconds_total": round(self._load_seconds, 6), "models": models}
+
+
+registry = ModelRegistry()
+
+
+# Training runs: every run gets MODEL_DIR/<name>_versions/<utc timestamp>/ with its
+# artifacts and an info.json; CURRENT names the version being served.
+
+def versions_root(name: str) -> Path:
+    return get_model_path(f"{name}_versions")
+
+
+def new_version(name: str) -> Tuple[str, Path]:
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    path = versions_root(name) / version
+    path.mkdir(parents=True)
+    return version, path
+
+
+def _write_json(path: Path, data: Any) -> None:
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    tmp.write_text(json.dumps(data, default=str))
+    os.replace(tmp, path)
+
+
+def write_version_info(path: Path, info: dict) -> None:
+    _write_json(path / "info.json", info)
+
+
+def should_promote(promote: str, mae: float, incumbent_mae: Optional[float]) -> bool:
+    """promote="auto": only when the new run beats the served model on the same validation
+    data; "force": always; "never": keep it as a version only."""
+    if promote == "force":
+        return True
+    if promote != "auto":
+        return False
+    return incumbent_mae is None or mae < incumbent_mae * (1 - settings.model_promote_min_improvement)
+
+
+def current_version(name: str) -> Optional[str]:
+    try:
+        return json.loads((versions_root(name) / "CURRENT").read_text())["version"]
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+
+
+def set_current_version(name: str, version: str) -> None:
+    _write_json(versions_root(name) / "CURRENT", {"version": version, "promoted_at": datetime.now(timezone.utc).isoformat()})
+
+
+def list_versions(name: str) -> List[dict]:
+    root = versions_root(name)
+    if not root.exists():
+        return []
+    current = current_version(name)
+    out = []
+    for path in sorted((p for p in root.iterdir() if p.is_dir()), reverse=True):
+        try:
+            info = json.loads((path / "info.json").read_text())
+        except (FileNotFoundError, ValueError):
+            info = {}
+        out.append({"version": path.name, "current": path.name == current, **info})
+    return out
+
+
+def prune_versions(name: str, keep: int) -> int:
+    """Delete all but the newest `keep` versions; the current one is always kept."""
+    current = current_version(name)
+    root = versions_root(name)
+    old = sorted((p for p in root.iterdir() if p.is_dir()), reverse=True)[max(keep, 0):]
+    removed = 0
+    for path in old:
+        if path.name != current:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
@@ -1,68 +1,334 @@
 from __future__ import annotations
 import os
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import numpy as np
+import pandas as pd
 import xarray as xr
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import r2_score, mean_absolute_error
+import xgboost as xgb
 from xgboost import XGBRegressor
 import joblib
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import dask.array as dask_array
 from datetime import datetime, timedelta, timezone
-from services.storage import get_model_path
+from config import settings
+from services.storage import get_model_path, list_partitions, prediction_target
+from services.jobs import report_progress
+from services.model_registry import current_version, new_version, prune_versions, registry, set_current_version, should_promote, write_version_info
+from services.feature_schema import FeatureSchema
+from services.xgb_backends import predictor
+from services.features import BASE_FEATURES, FEATURE_STORE, exog_columns, latest_exog, latest_exog_many
 
+# Bundle of the served model and the feature schema it was trained with, published
+# as one file so a reader never pairs a model with another run's schema
 MODEL_NAME = "xgb_aqi.pkl"
+# Schema written next to models saved before the bundle (those pickles hold the model only)
+SCHEMA_NAME = "xgb_aqi.schema.json"
+# Training runs are kept under MODEL_DIR/xgb_aqi_versions/<version>/
+VERSIONS_NAME = "xgb_aqi"
+# Time samples kept per training run to place the validation cutoff
+_CUTOFF_SAMPLE = 1_000_000
 
 
-def _dataset_from_zarr(zarr_path: str) -> xr.Dataset:
-    return xr.open_zarr(zarr_path)
-
-
-def _build_features_from_ds(ds: xr.Dataset) -> tuple[np.ndarray, np.ndarray]:
+def _feature_matrix(ds: xr.Dataset, schema: FeatureSchema) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(X, y, usable rows) for every obs row of `ds`, columns in schema order."""
     values = ds["value"].values.astype(float)
     lats = ds["lat"].values.astype(float)
     lons = ds["lon"].values.astype(float)
-    params = ds["parameter"].values.astype(str)
-    times = np.array(ds["time"].values)
-    param_map = {p: i for i, p in enumerate(sorted(set(params)))}
-    param_ids = np.array([param_map.get(p, -1) for p in params], dtype=float)
-    timestamps = np.array(times, dtype="datetime64[s]").astype("datetime64[s]")
-    hours = np.array((timestamps.astype("datetime64[h]") - timestamps.astype("datetime64[D]")).astype(int))
-    weekdays = np.array(((timestamps.astype("datetime64[D]") - timestamps.astype("datetime64[W]")).astype(int)))
-    X = np.column_stack([lats, lons, param_ids, hours, weekdays])
-    y = values
-    mask = np.isfinite(X).all(axis=1) & np.isfinite(y)
-    return X[mask], y[mask]
-
-
-def train_from_zarr(zarr_path: str, test_size: float = 0.2, random_state: int = 42) -> dict:
-    ds = _dataset_from_zarr(zarr_path)
-    X, y = _build_features_from_ds(ds)
-    if len(X) < 100:
+    param_ids = schema.encode_parameters(ds["parameter"].values)
+    if "hour" in ds and "weekday" in ds:
+        # Materialized by the feature store
+        hours = ds["hour"].values.astype(float)
+        weekdays = ds["weekday"].values.astype(float)
+    else:
+        timestamps = np.array(ds["time"].values, dtype="datetime64[s]")
+        days = timestamps.astype("datetime64[D]")
+        hours = (timestamps.astype("datetime64[h]") - days).astype(int)
+        # Monday == 0 like datetime.weekday() at inference (1970-01-01 was a Thursday)
+        weekdays = (days.astype("int64") + 3) % 7
+    # Gridded features may be missing (XGBoost handles NaN); absent columns are all-NaN
+    exog = [ds[n].values.astype(float) if n in ds else np.full(len(values), np.nan) for n in schema.features[len(BASE_FEATURES):]]
+    X = np.column_stack([lats, lons, param_ids, hours, weekdays, *exog])
+    mask = np.isfinite(X[:, :len(BASE_FEATURES)]).all(axis=1)
+    return X, values, mask
+
+
+def _training_stores(paths: List[str]) -> List[xr.Dataset]:
+    """Lazy flat views of each store; nothing is read until a chunk is loaded."""
+    stores = []
+    for path in paths:
+        flat = xr.open_zarr(path).reset_coords()
+        if int(flat.sizes.get("obs", 0)) and {"value", "lat", "lon", "parameter", "time"} <= set(flat.variables):
+            stores.append(flat)
+    return stores
+
+
+def _scan(stores: List[xr.Dataset], valid_fraction: float) -> Tuple[FeatureSchema, int]:
+    """One pass over the parameter and time columns only: fit the schema and place the
+    time cutoff so the newest `valid_fraction` of rows is held out for validation."""
+    rows = settings.train_chunk_rows
+    total = sum(int(ds.sizes["obs"]) for ds in stores)
+    stride = max(1, total // _CUTOFF_SAMPLE)
+    params = set()
+    times = []
+    for ds in stores:
+        for sl in _obs_slices(int(ds.sizes["obs"]), rows):
+            chunk = ds[["parameter", "time"]].isel(obs=sl).load()
+            # pandas rather than a numpy str cast, which fails on zarr v3 StringDType
+            params.update(pd.unique(pd.Series(chunk["parameter"].values).astype(str)).tolist())
+            times.append(chunk["time"].values.astype("datetime64[s]").astype("int64")[::stride])
+    names = BASE_FEATURES + sorted({c for ds in stores for c in exog_columns(ds.data_vars)})
+    cutoff = int(np.quantile(np.concatenate(times), 1 - valid_fraction)) if times else 0
+    return FeatureSchema(names, sorted(params)), cutoff
+
+
+def _split_rows(stores: List[xr.Dataset], schema: FeatureSchema, cutoff: int, valid: bool) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """(X, y) chunk by chunk for the usable rows on one side of the time cutoff."""
+    rows = settings.train_chunk_rows
+    needed = ["value", "lat", "lon", "parameter", "time", "hour", "weekday", *schema.features[len(BASE_FEATURES):]]
+    for ds in stores:
+        # Only the columns the features use; other variables are never read
+        view = ds[[v for v in needed if v in ds]]
+        for sl in _obs_slices(int(view.sizes["obs"]), rows):
+            chunk = view.isel(obs=sl).load()
+            X, y, mask = _feature_matrix(chunk, schema)
+            t = chunk["time"].values.astype("datetime64[s]").astype("int64")
+            mask &= np.isfinite(y) & ((t >= cutoff) if valid else (t < cutoff))
+            if mask.any():
+                yield X[mask], y[mask]
+
+
+class _ChunkIter(xgb.DataIter):
+    """Feeds the stores to XGBoost one chunk at a time, so neither the raw table nor
+    the float matrix is ever held whole."""
+
+    def __init__(self, stores: List[xr.Dataset], schema: FeatureSchema, cutoff: int, valid: bool, cache_prefix: Optional[str] = None) -> None:
+        self._args = (stores, schema, cutoff, valid)
+        self._rows = _split_rows(*self._args)
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        X, y = next(self._rows, (None, None))
+        if X is None:
+            return False
+        input_data(data=X, label=y)
+        return True
+
+    def reset(self) -> None:
+        self._rows = _split_rows(*self._args)
+
+
+def _quantile_dmatrices(stores: List[xr.Dataset], schema: FeatureSchema, cutoff: int) -> Tuple[xgb.DMatrix, xgb.DMatrix]:
+    max_bin = settings.xgb_max_bin
+    if settings.xgb_external_memory and hasattr(xgb, "ExtMemQuantileDMatrix"):
+        cache = get_model_path("xgb_cache")
+        cache.mkdir(parents=True, exist_ok=True)
+        dtrain = xgb.ExtMemQuantileDMatrix(_ChunkIter(stores, schema, cutoff, False, str(cache / "train")), max_bin=max_bin)
+        dvalid = xgb.ExtMemQuantileDMatrix(_ChunkIter(stores, schema, cutoff, True, str(cache / "valid")), max_bin=max_bin, ref=dtrain)
+    else:
+        # Only the quantized histogram index is kept in memory
+        dtrain = xgb.QuantileDMatrix(_ChunkIter(stores, schema, cutoff, False), max_bin=max_bin)
+        dvalid = xgb.QuantileDMatrix(_ChunkIter(stores, schema, cutoff, True), max_bin=max_bin, ref=dtrain)
+    return dtrain, dvalid
+
+
+class _BoostProgress(xgb.callback.TrainingCallback):
+    def __init__(self, every: int = 10) -> None:
+        self.every = every
+
+    def after_iteration(self, model, epoch: int, evals_log) -> bool:
+        if epoch % self.every == 0:
+            mae = evals_log.get("valid", {}).get("mae", [None])[-1]
+            report_progress(stage="boosting", round=epoch, valid_mae=mae)
+        return False
+
+
+def _incumbent_mae(stores: List[xr.Dataset], cutoff: int) -> Optional[float]:
+    """Validation MAE of the model being served, on the same held-out rows as the new one."""
+    try:
+        model, schema = load_model_and_schema()
+    except ValueError:
+        return None
+    if model is None:
+        return None
+    total, n = 0.0, 0
+    for X, y in _split_rows(stores, schema, cutoff, True):
+        total += float(np.abs(predictor(model)(X) - y).sum())
+        n += int(y.size)
+    return total / n if n else None
+
+
+def _train(paths: List[str], valid_fraction: float, random_state: int, promote: str = "auto") -> dict:
+    """Train with the hist method on QuantileDMatrix built from a chunk iterator, validate
+    on the newest rows with early stopping, and save the run as a new version. It is
+    promoted to the served model when it beats the current one on the same validation
+    rows (promote="auto"), always ("force") or never ("never")."""
+    stores = _training_stores(paths)
+    if not stores:
         raise ValueError("Not enough samples to train (need >= 100)")
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
-    model = XGBRegressor(n_estimators=300, max_depth=6, learning_rate=0.08, subsample=0.8, colsample_bytree=0.8, reg_lambda=1.0, n_jobs=4)
-    model.fit(X_train, y_train)
-    y_pred = model.predict(X_test)
+    report_progress(stage="scan", stores=len(stores))
+    schema, cutoff = _scan(stores, valid_fraction)
+    report_progress(stage="quantize", features=len(schema.features))
+    dtrain, dvalid = _quantile_dmatrices(stores, schema, cutoff)
+    if dtrain.num_row() < 100 or dvalid.num_row() == 0:
+        raise ValueError("Not enough samples to train (need >= 100, and newer rows to validate on)")
+    params = {
+        "objective": "reg:squarederror",
+        "tree_method": "hist",
+        "max_depth": 6,
+        "learning_rate": 0.08,
+        "subsample": 0.8,
+        "colsample_bytree": 0.8,
+        "reg_lambda": 1.0,
+        "max_bin": settings.xgb_max_bin,
+        "eval_metric": "mae",
+        "nthread": 4,
+        "seed": random_state,
+    }
+    booster = xgb.train(
+        params,
+        dtrain,
+        num_boost_round=settings.xgb_num_boost_round,
+        evals=[(dvalid, "valid")],
+        early_stopping_rounds=settings.xgb_early_stopping_rounds,
+        verbose_eval=False,
+        callbacks=[_BoostProgress()],
+    )
+    best = booster.best_iteration
+    booster = booster[: best + 1]
+    y_valid = dvalid.get_label()
+    y_pred = booster.predict(dvalid)
     metrics = {
-        "r2": float(r2_score(y_test, y_pred)),
-        "mae": float(mean_absolute_error(y_test, y_pred)),
-        "n_train": int(len(X_train)),
-        "n_test": int(len(X_test)),
+        "r2": float(r2_score(y_valid, y_pred)),
+        "mae": float(mean_absolute_error(y_valid, y_pred)),
+        "n_train": int(dtrain.num_row()),
+        "n_test": int(dvalid.num_row()),
+        "best_iteration": int(best),
+        "valid_from": str(np.datetime64(cutoff, "s")),
     }
+    report_progress(stage="evaluate", **metrics)
+    incumbent = _incumbent_mae(stores, cutoff) if promote == "auto" else None
+    promoted = should_promote(promote, metrics["mae"], incumbent)
+    version, vdir = new_version(VERSIONS_NAME)
+    try:
+        booster.save_model(str(vdir / "model.ubj"))
+        schema.save(str(vdir / "schema.json"))
+        write_version_info(vdir, {"metrics": metrics, "incumbent_mae": incumbent, "promoted": promoted})
+    except Exception:
+        shutil.rmtree(vdir, ignore_errors=True)
+        raise
     model_path = get_model_path(MODEL_NAME)
-    joblib.dump(model, model_path)
-    return {"model_path": str(model_path), "metrics": metrics}
+    if promoted:
+        model = XGBRegressor()
+        model.load_model(str(vdir / "model.ubj"))
+        bundle = {"model": model, "schema": schema.to_dict()}
+        registry.publish(str(model_path), (model, schema), lambda tmp: joblib.dump(bundle, tmp))
+        set_current_version(VERSIONS_NAME, version)
+    prune_versions(VERSIONS_NAME, settings.model_keep_versions)
+    return {
+        "model_path": str(model_path),
+        "version": version,
+        "promoted": promoted,
+        "current_version": current_version(VERSIONS_NAME),
+        "incumbent_mae": incumbent,
+        "metrics": metrics,
+        "features": schema.features,
+        "parameters": schema.parameters.tolist(),
+    }
+
+
+def train_from_zarr(zarr_path: str, test_size: float | None = None, random_state: int = 42, promote: str = "auto") -> dict:
+    """`test_size` is the newest fraction of rows (by time) used for validation."""
+    return _train([zarr_path], settings.train_valid_fraction if test_size is None else test_size, random_state, promote)
+
+
+def train_from_features(
+    days: Optional[int] = None, test_size: float | None = None, random_state: int = 42, promote: str = "auto"
+) -> dict:
+    """Train on the materialized feature store (see services.features), streaming its
+    day partitions."""
+    parts = list_partitions(FEATURE_STORE)
+    if days:
+        parts = parts[-days:]
+    if not parts:
+        raise ValueError("Feature store is empty; ingest observations or backfill it (POST /api/forecast/features/backfill)")
+    return _train(parts, settings.train_valid_fraction if test_size is None else test_size, random_state, promote)
+
+
+def _load_bundle(path: str) -> Tuple[XGBRegressor, FeatureSchema]:
+    obj = joblib.load(path)
+    if isinstance(obj, dict) and "model" in obj:
+        return obj["model"], FeatureSchema.from_dict(obj["schema"])
+    legacy = get_model_path(SCHEMA_NAME)
+    # Models saved before schemas existed used the base features only
+    return obj, FeatureSchema.load(str(legacy)) if legacy.exists() else FeatureSchema(BASE_FEATURES, [])
+
+
+def _bundle() -> Tuple[Optional[XGBRegressor], FeatureSchema]:
+    # Cached per process; reloaded only when the artifact on disk changes
+    bundle = registry.get(str(get_model_path(MODEL_NAME)), _load_bundle)
+    return bundle if bundle is not None else (None, FeatureSchema(BASE_FEATURES, []))
+
+
+def load_schema() -> FeatureSchema:
+    return _bundle()[1]
+
+
+def load_feature_names() -> List[str]:
+    return list(load_schema().features)
+
+
+def load_model_and_schema() -> Tuple[Optional[XGBRegressor], FeatureSchema]:
+    model, schema = _bundle()
+    expected = getattr(model, "n_features_in_", None)
+    if model is not None and expected is not None:
+        schema.validate(int(expected))
+    return model, schema
+
+
+def resolve_parameter_id(parameter: Optional[str], parameter_id: Optional[float]) -> float:
+    """Id for a parameter name in the trained vocabulary; an explicit id is used as is."""
+    if parameter is not None:
+        return load_schema().parameter_id(parameter)
+    return float(parameter_id) if parameter_id is not None else 0.0
+
+
+def _exog_values(lat: float, lon: float, names: List[str], features: Optional[Dict[str, Any]] = None) -> List[float]:
+    exog = names[len(BASE_FEATURES):]
+    if not exog:
+        return []
+    features = features or {}
+    fill = latest_exog(lat, lon)
+    return [float(features[n]) if features.get(n) is not None else fill.get(n, np.nan) for n in exog]
+
+
+def feature_row(features: Dict[str, Any], schema: Optional[FeatureSchema] = None) -> Tuple[np.ndarray, List[str]]:
+    """Single-row model input for a request; gridded features not supplied are taken
+    from the nearest station in the feature store. Pass the `schema` loaded with the
+    model so both come from the same bundle."""
+    schema = schema or load_schema()
+    names = schema.features
+    lat = float(features.get("lat", 0.0))
+    lon = float(features.get("lon", 0.0))
+    if features.get("parameter") is not None:
+        param_id = schema.parameter_id(str(features["parameter"]))
+    else:
+        param_id = float(features.get("parameter_id", 0.0))
+    hour = float(features.get("hour", 12.0))
+    weekday = float(features.get("weekday", 3.0))
+    X = np.array([[lat, lon, param_id, hour, weekday, *_exog_values(lat, lon, names, features)]], dtype=float)
+    schema.validate(X.shape[1])
+    return X, list(names)
 
 
 def load_model() -> XGBRegressor | None:
-    model_path = get_model_path(MODEL_NAME)
-    if not os.path.exists(model_path):
-        return None
-    return joblib.load(model_path)
+    return _bundle()[0]
 
 
 async def predict_stub(features: Dict[str, Any]) -> float:
-    model = load_model()
+    model, schema = load_model_and_schema()
     if model is None:
         weights = {
             "no2": 0.4,
@@ -81,83 +347,205 @@ async def predict_stub(features: Dict[str, Any]) -> float:
             except Exception:
                 continue
         return float(np.clip(total, 0, 500))
-    lat = float(features.get("lat", 0.0))
-    lon = float(features.get("lon", 0.0))
-    param_id = float(features.get("parameter_id", 0.0))
-    hour = float(features.get("hour", 12.0))
-    weekday = float(features.get("weekday", 3.0))
-    X = np.array([[lat, lon, param_id, hour, weekday]], dtype=float)
-    yhat = float(model.predict(X)[0])
+    X, _ = feature_row(features, schema)
+    yhat = float(predictor(model)(X)[0])
     return float(np.clip(yhat, 0, 500))
 
 
-def batch_predict_from_zarr(zarr_path: str) -> dict:
-    model = load_model()
+class _RunningStats:
+    """Count/sum/sum of squares/min/max merged chunk by chunk."""
+
+    def __init__(self) -> None:
+        self.n = 0
+        self.total = 0.0
+        self.sq = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, yhat: np.ndarray) -> None:
+        if yhat.size == 0:
+            return
+        self.n += int(yhat.size)
+        self.total += float(yhat.sum())
+        self.sq += float(np.square(yhat, dtype=float).sum())
+        self.min = min(self.min, float(yhat.min()))
+        self.max = max(self.max, float(yhat.max()))
+
+    def result(self) -> dict:
+        if self.n == 0:
+            return {"n": 0, "mean_pred": None, "max_pred": None, "min_pred": None, "std_pred": None}
+        mean = self.total / self.n
+        return {
+            "n": self.n,
+            "mean_pred": mean,
+            "max_pred": self.max,
+            "min_pred": self.min,
+            "std_pred": float(np.sqrt(max(self.sq / self.n - mean * mean, 0.0))),
+        }
+
+
+def _obs_slices(n: int, rows: int) -> List[slice]:
+    return [slice(a, min(a + rows, n)) for a in range(0, n, rows)]
+
+
+def _predict_store(zarr_path: str, model, schema: FeatureSchema, stats: _RunningStats, write: bool) -> int:
+    """Score one obs store chunk by chunk in a thread pool. With `write`, predictions
+    go to the sidecar store at prediction_target(zarr_path): a `prediction` variable
+    on the `obs` index of the rows scored (NaN where a row could not be scored), each
+    chunk written to its own Zarr region. The source store is only read, so ingests
+    can keep appending to it."""
+    ds = xr.open_zarr(zarr_path)
+    n = int(ds.sizes.get("obs", 0))
+    if n == 0:
+        return 0
+    rows = max(1, settings.predict_chunk_rows)
+    slices = _obs_slices(n, rows)
+    # Only the columns the features use; other obs coordinates are never read
+    flat = ds.reset_coords()
+    needed = [v for v in ["value", "lat", "lon", "parameter", "time", "hour", "weekday", *schema.features[len(BASE_FEATURES):]] if v in flat]
+    cols = flat[needed]
+    target = prediction_target(zarr_path)
+    if write:
+        # Metadata only, recreated on every run since the source may have grown; chunk
+        # size matches the regions so parallel writes never share a chunk
+        empty = xr.Dataset(
+            {"prediction": ("obs", dask_array.full(n, np.nan, chunks=rows))},
+            coords={"obs": np.arange(n)},
+            attrs={"source": zarr_path},
+        )
+        empty.to_zarr(target, mode="w", compute=False, encoding={"prediction": {"chunks": (rows,)}})
+    lock = threading.Lock()
+    predict = predictor(model)
+
+    def _score(sl: slice) -> None:
+        chunk = cols.isel(obs=sl).load()
+        X, _, mask = _feature_matrix(chunk, schema)
+        yhat = np.full(X.shape[0], np.nan)
+        if mask.any():
+            yhat[mask] = predict(X[mask])
+        with lock:
+            stats.add(yhat[mask])
+        if write:
+            xr.Dataset({"prediction": ("obs", yhat)}).to_zarr(target, region={"obs": sl})
+
+    with ThreadPoolExecutor(max_workers=max(1, settings.predict_workers)) as pool:
+        list(pool.map(_score, slices))
+    return len(slices)
+
+
+def _batch_predict(paths: List[str], write: bool) -> dict:
+    model, schema = load_model_and_schema()
     if model is None:
         raise ValueError("Model not trained")
-    ds = _dataset_from_zarr(zarr_path)
-    X, y = _build_features_from_ds(ds)
-    yhat = model.predict(X)
-    return {"n": int(len(yhat)), "mean_pred": float(np.mean(yhat)), "max_pred": float(np.max(yhat))}
+    stats = _RunningStats()
+    chunks = sum(_predict_store(p, model, schema, stats, write) for p in paths)
+    return {**stats.result(), "chunks": chunks, "written": write}
+
+
+def batch_predict_from_zarr(zarr_path: str, write: bool = True) -> dict:
+    return _batch_predict([zarr_path], write)
+
+
+def batch_predict_from_features(days: Optional[int] = None, write: bool = True) -> dict:
+    """Score the feature store partition by partition."""
+    parts = list_partitions(FEATURE_STORE)
+    if days:
+        parts = parts[-days:]
+    if not parts:
+        raise ValueError("Feature store is empty; ingest observations or backfill it (POST /api/forecast/features/backfill)")
+    return _batch_predict(parts, write)
+
+
+def _horizon_calendar(now: datetime, hours: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Hour of day, weekday (Monday == 0) and day of year for each step of the horizon."""
+    stamps = np.datetime64(now.replace(tzinfo=None), "s") + np.arange(hours) * np.timedelta64(1, "h")
+    days = stamps.astype("datetime64[D]")
+    hour = (stamps.astype("datetime64[h]") - days).astype(int)
+    # 1970-01-01 was a Thursday
+    weekday = (days.astype("int64") + 3) % 7
+    yday = (days - days.astype("datetime64[Y]")).astype(int) + 1
+    return hour, weekday, yday
+
+
+def _timeline_means(lats: np.ndarray, lons: np.ndarray, parameter_id: float, hours: int, now: datetime) -> np.ndarray:
+    """(locations x hours) forecast means: one model.predict over all rows, or one
+    vectorized baseline."""
+    n = lats.size
+    hour, weekday, yday = _horizon_calendar(now, hours)
+    model, schema = load_model_and_schema()
+
+    if model is None:
+        # More realistic AQI simulation based on:
+        # 1. Time of day (rush hour peaks)
+        # 2. Day of week (weekend vs weekday)
+        # 3. Location (urban vs rural)
+        # 4. Random weather-like variations
+
+        # Location-based baseline AQI (more realistic than simple sine wave)
+        # Urban areas typically have higher AQI
+        is_urban = (lats > 25) & (lats < 50) & (lons > -130) & (lons < -60)  # North America urban corridor
+        base_aqi = np.where(is_urban, 35.0, 25.0)[:, None]  # Base AQI level
+
+        # Rush hour effect (7-9 AM and 5-7 PM), quieter at night
+        rush = ((hour >= 7) & (hour <= 9)) | ((hour >= 17) & (hour <= 19))
+        night = (hour >= 22) | (hour <= 5)
+        rush_hour_factor = np.where(rush, 1.4, np.where(night, 0.7, 1.0))
+        # Weekend effect
+        weekend_factor = np.where(weekday >= 5, 0.8, 1.0)
+        # Seasonal variation (simulate different seasons)
+        seasonal_factor = 1.0 + 0.3 * np.sin((yday / 365.0) * 2 * np.pi)
+        # Random weather-like variation
+        weather_variation = np.random.normal(0, 8, size=(n, hours))
+
+        base = base_aqi * (rush_hour_factor * weekend_factor * seasonal_factor)[None, :] + weather_variation
+        return np.clip(base, 10, 200)  # More realistic range
+
+    # Rows are location-major: location i covers rows i*hours .. (i+1)*hours-1.
+    # Gridded features are held at their latest values over the horizon.
+    names = schema.features
+    exog = latest_exog_many(lats, lons, names[len(BASE_FEATURES):])
+    X = np.empty((n * hours, len(names)), dtype=float)
+    X[:, 0] = np.repeat(lats, hours)
+    X[:, 1] = np.repeat(lons, hours)
+    X[:, 2] = parameter_id
+    X[:, 3] = np.tile(hour, n)
+    X[:, 4] = np.tile(weekday, n)
+    X[:, len(BASE_FEATURES):] = np.repeat(exog, hours, axis=0)
+    return np.clip(predictor(model)(X), 0, 500).reshape(n, hours)
+
+
+def _bands(preds: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # More realistic uncertainty bands
+    spread = np.clip(0.1 * preds + 3.0, 2.0, 25.0)
+    return np.clip(preds - spread, 0, 500), np.clip(preds + spread, 0, 500)
 
 
 def timeline_forecast(lat: float, lon: float, parameter_id: float = 0.0, hours: int = 24) -> dict:
     """Generate next `hours` forecast with realistic uncertainty bands.
     Uses trained model if available; otherwise uses location-aware realistic baseline.
+    The whole horizon is computed as arrays: one model.predict call, or one vectorized baseline.
     """
     now = datetime.now(timezone.utc)
     times = [now + timedelta(hours=i) for i in range(hours)]
-    model = load_model()
-    preds: List[float] = []
-    
-    # Location-based baseline AQI (more realistic than simple sine wave)
-    # Urban areas typically have higher AQI
-    is_urban = (lat > 25 and lat < 50 and lon > -130 and lon < -60)  # North America urban corridor
-    base_aqi = 35 if is_urban else 25  # Base AQI level
-    
-    for t in times:
-        hour = float(t.hour)
-        weekday = float(t.weekday())
-        if model is None:
-            # More realistic AQI simulation based on:
-            # 1. Time of day (rush hour peaks)
-            # 2. Day of week (weekend vs weekday)
-            # 3. Location (urban vs rural)
-            # 4. Random weather-like variations
-            
-            # Rush hour effect (7-9 AM and 5-7 PM)
-            rush_hour_factor = 1.0
-            if 7 <= hour <= 9 or 17 <= hour <= 19:
-                rush_hour_factor = 1.4
-            elif 22 <= hour or hour <= 5:  # Night time
-                rush_hour_factor = 0.7
-            
-            # Weekend effect
-            weekend_factor = 0.8 if weekday >= 5 else 1.0
-            
-            # Seasonal variation (simulate different seasons)
-            seasonal_factor = 1.0 + 0.3 * np.sin((t.timetuple().tm_yday / 365.0) * 2 * np.pi)
-            
-            # Random weather-like variation
-            weather_variation = np.random.normal(0, 8)
-            
-            # Calculate realistic AQI
-            base = base_aqi * rush_hour_factor * weekend_factor * seasonal_factor + weather_variation
-            preds.append(float(np.clip(base, 10, 200)))  # More realistic range
-        else:
-            X = np.array([[lat, lon, parameter_id, hour, weekday]], dtype=float)
-            yhat = float(model.predict(X)[0])
-            preds.append(float(np.clip(yhat, 0, 500)))
-    
-    preds = np.array(preds)
-    # More realistic uncertainty bands
-    spread = np.clip(0.1 * preds + 3.0, 2.0, 25.0)
-    lower = np.clip(preds - spread, 0, 500)
-    upper = np.clip(preds + spread, 0, 500)
-    
+    preds = _timeline_means(np.array([lat], dtype=float), np.array([lon], dtype=float), parameter_id, hours, now)[0]
+    lower, upper = _bands(preds)
     return {
         "times": [t.isoformat() for t in times],
         "mean": preds.tolist(),
         "lower": lower.tolist(),
         "upper": upper.tolist(),
     }
+
+
+def timeline_forecast_batch(lats: List[float], lons: List[float], parameter_id: float = 0.0, hours: int = 24) -> dict:
+    """Timelines for many locations from one (locations*hours) x features predict.
+    Columnar: mean/lower/upper are lists of per-location series aligned with `times`."""
+    now = datetime.now(timezone.utc)
+    preds = _timeline_means(np.asarray(lats, dtype=float), np.asarray(lons, dtype=float), parameter_id, hours, now)
+    lower, upper = _bands(preds)
+    return {
+        "times": [(now + timedelta(hours=i)).isoformat() for i in range(hours)],
+        "mean": preds.tolist(),
+        "lower": lower.tolist(),
+        "upper": upper.tolist(),
+    }
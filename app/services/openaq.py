@@ -1,4 +1,5 @@
 from __future__ import annotations
+import asyncio
 import httpx
 import pandas as pd
 import xarray as xr
@@ -6,11 +7,24 @@ import numpy as np
 from typing import Optional, List
 from datetime import datetime, timezone
 from config import settings
-from services.storage import get_zarr_target
+from services.storage import get_zarr_target, store_lock, string_values, time_values, write_partitioned
+from services.http_client import get_async_client
+from services.ingest_state import drop_seen, get_watermark, mark_seen, set_watermark
+from services.jobs import report_progress
+from services.features import append_features, update_latest_features
+from services.station_buffer import update_station_buffer
+
+# Identity of an observation for incremental ingestion / dedupe
+OPENAQ_KEY = ["location", "parameter", "datetime"]
 
 
 async def fetch_openaq_page(
-    page: int, country: Optional[str], parameter: Optional[str], limit: int
+    page: int,
+    country: Optional[str],
+    parameter: Optional[str],
+    limit: int,
+    client: Optional[httpx.AsyncClient] = None,
+    date_from: Optional[str] = None,
 ) -> List[dict]:
     params = {
         "limit": limit,
@@ -22,13 +36,15 @@ async def fetch_openaq_page(
         params["country"] = country
     if parameter:
         params["parameter"] = parameter
+    if date_from:
+        params["date_from"] = date_from
     # Use the new OpenAQ v2 API endpoint
     url = f"{settings.openaq_base_url}/v2/measurements"
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.get(url, params=params)
-        r.raise_for_status()
-        payload = r.json()
-        return payload.get("results", [])
+    client = client or get_async_client()
+    r = await client.get(url, params=params, timeout=30)
+    r.raise_for_status()
+    payload = r.json()
+    return payload.get("results", [])
 
 
 def normalize_df(data: List[dict]) -> pd.DataFrame:
@@ -64,43 +80,137 @@ def df_to_dataset(df: pd.DataFrame) -> xr.Dataset:
         },
         coords={
             "obs": obs_index,
-            "time": ("obs", df["datetime"].to_numpy()),
+            "time": ("obs", time_values(df["datetime"])),
             "lat": ("obs", df["latitude"].astype(float).to_numpy()),
             "lon": ("obs", df["longitude"].astype(float).to_numpy()),
-            "parameter": ("obs", df["parameter"].astype(str).to_numpy()),
-            "unit": ("obs", df["unit"].astype(str).to_numpy()),
-            "location": ("obs", df["location"].astype(str).to_numpy()),
-            "country": ("obs", df["country"].astype(str).to_numpy()),
-            "city": ("obs", df["city"].astype(str).to_numpy()),
+            "parameter": ("obs", string_values(df["parameter"])),
+            "unit": ("obs", string_values(df["unit"])),
+            "location": ("obs", string_values(df["location"])),
+            "country": ("obs", string_values(df["country"])),
+            "city": ("obs", string_values(df["city"])),
         },
     )
     return ds
 
 
+def _write_batch(df: pd.DataFrame) -> pd.DataFrame:
+    """Write one page and return the rows that were new."""
+    # Dedupe, append, feature rows and marking the keys seen form one step against
+    # other ingest jobs and a feature backfill
+    with store_lock("openaq_measurements"):
+        df = drop_seen("openaq_measurements", df, OPENAQ_KEY)
+        if df.empty:
+            return df
+        write_partitioned(df, "openaq_measurements", df_to_dataset)
+        mark_seen("openaq_measurements", df, OPENAQ_KEY)
+        append_features(df)
+    return df
+
+
 async def ingest_openaq_to_zarr(
-    country: Optional[str], parameter: Optional[str], limit: int
+    country: Optional[str], parameter: Optional[str], limit: int, concurrency: Optional[int] = None
 ) -> int:
-    page = 1
+    """Pipelined ingest: up to `concurrency` pages are in flight at once, pages are
+    normalized in worker threads and a single writer appends them to Zarr.
+
+    Only observations newer than the stored watermark for this country/parameter
+    are requested, and rows already present in their day partition are dropped.
+    """
+    k = max(1, concurrency or settings.openaq_concurrency)
+    state_key = f"openaq:country={country or '*'}:parameter={parameter or '*'}"
+    watermark = get_watermark(state_key)
+    date_from = watermark.isoformat() if watermark else None
+    client = get_async_client()
+    sem = asyncio.Semaphore(k)
+    # Bounded queue gives the fetchers backpressure when Zarr writes fall behind
+    queue: asyncio.Queue = asyncio.Queue(maxsize=k)
+    # Lowest page known to be the last one (short or empty); pages after it are dropped
+    last_page: Optional[int] = None
     total = 0
-    while True:
-        data = await fetch_openaq_page(page=page, country=country, parameter=parameter, limit=limit)
-        if not data:
-            break
-        df = normalize_df(data)
-        if df.empty:
-            break
-        ds = df_to_dataset(df)
-        dt = pd.to_datetime(df["datetime"].max(), utc=True).to_pydatetime()
-        target = get_zarr_target("openaq_measurements", partitioned=True, dt=dt)
-        mode = "w" if total == 0 and page == 1 else "a"
-        ds.to_zarr(target, mode=mode, append_dim="obs")
-        total += len(df)
-        if len(data) < limit:
-            break
-        page += 1
+    newest: Optional[pd.Timestamp] = None
+    latest: Optional[tuple[int, pd.DataFrame]] = None
+    # New rows of every page, pushed to the station buffer once at the end of the run
+    written: list[pd.DataFrame] = []
+
+    async def _fetch(page: int) -> None:
+        nonlocal last_page
+        try:
+            data = await fetch_openaq_page(
+                page=page, country=country, parameter=parameter, limit=limit, client=client, date_from=date_from
+            )
+            if len(data) < limit:
+                last_page = page if last_page is None else min(last_page, page)
+            if not data or (last_page is not None and page > last_page):
+                return
+            df = await asyncio.to_thread(normalize_df, data)
+            if df.empty:
+                last_page = page if last_page is None else min(last_page, page)
+                return
+            await queue.put((page, df))
+        except BaseException:
+            # Stop handing out new pages; the error is re-raised by gather below
+            last_page = page - 1 if last_page is None else min(last_page, page - 1)
+            raise
+        finally:
+            sem.release()
+
+    async def _writer() -> None:
+        nonlocal total, newest, latest
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            page, df = item
+            if last_page is not None and page > last_page:
+                continue
+            new = await asyncio.to_thread(_write_batch, df)
+            if not new.empty:
+                total += len(new)
+                written.append(new[["datetime", "latitude", "longitude", "parameter", "value", "location"]])
+            batch_max = pd.to_datetime(df["datetime"].max(), utc=True)
+            newest = batch_max if newest is None else max(newest, batch_max)
+            await asyncio.to_thread(report_progress, records=total, last_page=page)
+            if latest is None or page > latest[0]:
+                latest = (page, df)
+
+    fetchers: list[asyncio.Task] = []
+
+    async def _dispatch() -> None:
+        page = 1
+        while True:
+            await sem.acquire()
+            if last_page is not None and page > last_page:
+                sem.release()
+                break
+            fetchers.append(asyncio.create_task(_fetch(page)))
+            page += 1
+        await asyncio.gather(*fetchers)
+        await queue.put(None)
+
+    tasks = [asyncio.create_task(_dispatch()), asyncio.create_task(_writer())]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        # A failed fetch or write must not leave the other side blocked on the queue
+        for t in tasks + fetchers:
+            t.cancel()
+        raise
+    finally:
+        if written:
+            new = pd.concat(written, ignore_index=True)
+            await asyncio.to_thread(update_latest_features, new)
+            await asyncio.to_thread(update_station_buffer, new)
+    # Advance only after every page was written so a failed run is retried in full
+    if newest is not None:
+        set_watermark(state_key, newest.to_pydatetime())
     # Also maintain latest consolidated unpartitioned view
-    if total > 0:
+    if total > 0 and latest is not None:
         target_latest = get_zarr_target("openaq_latest", partitioned=False)
-        ds_latest = df_to_dataset(df)
-        ds_latest.to_zarr(target_latest, mode="w")
+        ds_latest = df_to_dataset(latest[1])
+
+        def _write_latest() -> None:
+            with store_lock("openaq_latest"):
+                ds_latest.to_zarr(target_latest, mode="w")
+
+        await asyncio.to_thread(_write_latest)
     return total
@@ -1,35 +1,71 @@
 from __future__ import annotations
-from typing import Optional
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
 import pandas as pd
 import numpy as np
 import xarray as xr
 from datetime import timezone
 
-from services.storage import get_zarr_target
+try:
+    import pyarrow.csv as pacsv  # type: ignore
+except Exception:  # pragma: no cover
+    pacsv = None
 
+from config import settings
+from services.storage import TIME_UNITS, get_zarr_target
+from services.http_client import get_async_client
+from services.jobs import report_progress
 
-async def ingest_pandora_csv(url: str, parameter: Optional[str] = None) -> int:
-    """
-    Ingest a Pandora CSV export to Zarr. Expects columns including time and value; attempts
-    to detect latitude/longitude if present. Parameter name can be provided to tag the dataset.
+# Bytes per pyarrow read block; the pandas fallback uses PANDORA_CHUNK_ROWS instead
+ARROW_BLOCK_SIZE = 16 << 20
+
+
+async def _download(url: str) -> Path:
+    """Stream `url` to a temporary file so the CSV never has to fit in memory."""
+    fd, name = tempfile.mkstemp(prefix="pandora-", suffix=".csv")
+    path = Path(name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            async with get_async_client().stream("GET", url, timeout=None) as r:
+                r.raise_for_status()
+                async for chunk in r.aiter_bytes(1 << 20):
+                    f.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return path
+
+
+def _iter_chunks(path: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    if pacsv is not None:
+        reader = pacsv.open_csv(str(path), read_options=pacsv.ReadOptions(block_size=ARROW_BLOCK_SIZE))
+        for batch in reader:
+            yield batch.to_pandas()
+        return
+    yield from pd.read_csv(path, chunksize=chunk_rows)
+
+
+def _detect_columns(df: pd.DataFrame) -> Tuple[List[str], str, Optional[str], Optional[str]]:
+    """Column heuristics, run once on the first chunk. Returns (time columns, value
+    column, lat column, lon column); two time columns are a date + time pair.
     """
-    df = pd.read_csv(url)
     # Normalize time column
-    time_col = None
+    time_cols: List[str] = []
     for c in df.columns:
         lc = str(c).lower()
         if lc in {"time", "datetime", "timestamp", "utc"}:
-            time_col = c
+            time_cols = [c]
             break
-    if time_col is None:
+    if not time_cols:
         # Try combine date/time columns
         candidate_cols = [c for c in df.columns if str(c).lower() in {"date", "time_utc"}]
         if len(candidate_cols) >= 2:
-            df["__dt"] = pd.to_datetime(df[candidate_cols[0]] + " " + df[candidate_cols[1]], utc=True, errors="coerce")
-            time_col = "__dt"
+            time_cols = candidate_cols[:2]
         else:
             raise ValueError("Could not find timestamp column in Pandora CSV")
-    df["time"] = pd.to_datetime(df[time_col], utc=True, errors="coerce")
     # Value column heuristic
     val_col = None
     for c in df.columns:
@@ -46,15 +82,25 @@ async def ingest_pandora_csv(url: str, parameter: Optional[str] = None) -> int:
     # Coordinates if present
     lat_col = next((c for c in df.columns if str(c).lower() in {"lat", "latitude"}), None)
     lon_col = next((c for c in df.columns if str(c).lower() in {"lon", "longitude"}), None)
-    # Build dataset
-    obs = np.arange(len(df))
+    return time_cols, val_col, lat_col, lon_col
+
+
+def _chunk_dataset(
+    df: pd.DataFrame, columns: Tuple[List[str], str, Optional[str], Optional[str]], parameter: Optional[str], offset: int
+) -> xr.Dataset:
+    time_cols, val_col, lat_col, lon_col = columns
+    if len(time_cols) == 2:
+        raw_time = df[time_cols[0]].astype(str) + " " + df[time_cols[1]].astype(str)
+    else:
+        raw_time = df[time_cols[0]]
+    time = pd.to_datetime(raw_time, utc=True, errors="coerce").dt.tz_convert(None)
     ds = xr.Dataset(
         {
-            "value": ("obs", df[val_col].astype(float).to_numpy()),
+            "value": ("obs", pd.to_numeric(df[val_col], errors="coerce").astype(float).to_numpy()),
         },
         coords={
-            "obs": obs,
-            "time": ("obs", df["time"].to_numpy()),
+            "obs": np.arange(offset, offset + len(df)),
+            "time": ("obs", time.to_numpy()),
         },
     )
     if lat_col and lon_col:
@@ -64,9 +110,42 @@ async def ingest_pandora_csv(url: str, parameter: Optional[str] = None) -> int:
         )
     if parameter:
         ds = ds.assign_coords(parameter=("obs", np.array([parameter] * len(df), dtype=object)))
-    # Write to Zarr
+    return ds
+
+
+def _ingest_file(path: Path, parameter: Optional[str], chunk_rows: int) -> int:
     target = get_zarr_target("pandora_latest", partitioned=False)
-    ds.to_zarr(target, mode="w")
-    return int(ds.sizes.get("obs", 0))
+    columns = None
+    total = 0
+    for df in _iter_chunks(path, chunk_rows):
+        if df.empty:
+            continue
+        if columns is None:
+            columns = _detect_columns(df)
+        ds = _chunk_dataset(df, columns, parameter, total)
+        if total == 0:
+            # Later blocks reuse the store's time encoding; xarray would otherwise
+            # infer it from this block alone and truncate finer timestamps after it
+            ds.to_zarr(target, mode="w", encoding={"time": {"units": TIME_UNITS, "dtype": "int64"}})
+        else:
+            ds.to_zarr(target, mode="a", append_dim="obs")
+        total += len(df)
+        report_progress(records=total)
+    return total
+
 
+async def ingest_pandora_csv(url: str, parameter: Optional[str] = None) -> int:
+    """
+    Ingest a Pandora CSV export to Zarr. Expects columns including time and value; attempts
+    to detect latitude/longitude if present. Parameter name can be provided to tag the dataset.
 
+    The file is streamed to disk through the shared HTTP client and parsed in fixed-size
+    chunks (pyarrow when installed), each appended to Zarr, so memory stays bounded.
+    """
+    remote = url.startswith(("http://", "https://"))
+    path = await _download(url) if remote else Path(url)
+    try:
+        return await asyncio.to_thread(_ingest_file, path, parameter, settings.pandora_chunk_rows)
+    finally:
+        if remote:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,185 @@
+from __future__ import annotations
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+import numpy as np
+import xarray as xr
+
+try:
+    from scipy import sparse
+except Exception:  # pragma: no cover
+    sparse = None
+
+from config import settings
+from services.storage import TIME_UNITS, ensure_dir, get_zarr_target, zarr_exists
+
+logger = logging.getLogger(__name__)
+
+WEIGHTS_DIR = Path(settings.data_dir) / "regrid_weights"
+ANALYSIS_SOURCES = ("tempo", "merra2", "imerg", "hrrr")
+LAT_NAMES = ("lat", "latitude")
+LON_NAMES = ("lon", "longitude")
+# A target cell needs at least this much of its interpolation weight on valid
+# (non-NaN) source cells, otherwise it is left missing
+MIN_WEIGHT = 0.5
+
+_weights_lock = threading.Lock()
+_weights: Dict[str, "sparse.csr_matrix"] = {}
+
+
+def analysis_grid() -> Tuple[np.ndarray, np.ndarray]:
+    """Cell-centre latitudes and longitudes of the configured common grid."""
+    min_lon, min_lat, max_lon, max_lat = (float(v) for v in settings.analysis_grid_bbox.split(","))
+    res = settings.analysis_grid_res
+    lat = np.round(np.arange(min_lat + res / 2, max_lat, res), 6)
+    lon = np.round(np.arange(min_lon + res / 2, max_lon, res), 6)
+    return lat, lon
+
+
+def grid_hash(lat: np.ndarray, lon: np.ndarray) -> str:
+    h = hashlib.sha1()
+    for axis in (lat, lon):
+        a = np.ascontiguousarray(axis, dtype="float64")
+        h.update(str(a.shape).encode())
+        h.update(a.tobytes())
+    return h.hexdigest()[:16]
+
+
+def _spatial_dims(ds: xr.Dataset | xr.DataArray) -> Tuple[str, str]:
+    lat = next((n for n in LAT_NAMES if n in ds.dims), None)
+    lon = next((n for n in LON_NAMES if n in ds.dims), None)
+    if lat is None or lon is None or ds[lat].ndim != 1 or ds[lon].ndim != 1:
+        raise ValueError("regridding needs a rectilinear grid with 1-D lat/lon dimensions")
+    return lat, lon
+
+
+def _axis_weights(src: np.ndarray, dst: np.ndarray) -> "sparse.csr_matrix":
+    """Linear interpolation weights (len(dst) x len(src)) along one axis; targets
+    outside the source extent get an empty row."""
+    if src.size < 2:
+        raise ValueError("source grid needs at least two points per axis")
+    order = np.argsort(src)
+    s = src[order]
+    i = np.clip(np.searchsorted(s, dst, side="right") - 1, 0, s.size - 2)
+    t = (dst - s[i]) / (s[i + 1] - s[i])
+    inside = (dst >= s[0]) & (dst <= s[-1])
+    rows = np.nonzero(inside)[0]
+    i, t = i[inside], t[inside]
+    return sparse.csr_matrix(
+        (np.concatenate([1 - t, t]), (np.concatenate([rows, rows]), np.concatenate([order[i], order[i + 1]]))),
+        shape=(dst.size, src.size),
+    )
+
+
+def bilinear_weights(
+    src_lat: np.ndarray, src_lon: np.ndarray, dst_lat: np.ndarray, dst_lon: np.ndarray
+) -> "sparse.csr_matrix":
+    """Sparse (dst lat*lon) x (src lat*lon) bilinear operator for C-ordered (lat, lon) fields."""
+    if np.nanmax(src_lon) > 180:
+        # Source uses 0..360 longitudes
+        dst_lon = np.mod(dst_lon, 360)
+    w_lat = _axis_weights(np.asarray(src_lat, dtype="float64"), np.asarray(dst_lat, dtype="float64"))
+    w_lon = _axis_weights(np.asarray(src_lon, dtype="float64"), np.asarray(dst_lon, dtype="float64"))
+    return sparse.kron(w_lat, w_lon, format="csr")
+
+
+def get_weights(src_lat: np.ndarray, src_lon: np.ndarray) -> "sparse.csr_matrix":
+    """Weights from a source grid onto the analysis grid, computed once per grid pair
+    and kept in memory and under WEIGHTS_DIR as .npz."""
+    if sparse is None:
+        raise RuntimeError("scipy not installed")
+    dst_lat, dst_lon = analysis_grid()
+    key = f"{grid_hash(src_lat, src_lon)}-{grid_hash(dst_lat, dst_lon)}"
+    with _weights_lock:
+        w = _weights.get(key)
+        if w is not None:
+            return w
+        path = WEIGHTS_DIR / f"{key}.npz"
+        if path.exists():
+            w = sparse.load_npz(path).tocsr()
+        else:
+            w = bilinear_weights(src_lat, src_lon, dst_lat, dst_lon)
+            ensure_dir(WEIGHTS_DIR)
+            tmp = path.with_suffix(".tmp.npz")
+            sparse.save_npz(tmp, w)
+            tmp.replace(path)
+        _weights[key] = w
+        return w
+
+
+def _apply(w: "sparse.csr_matrix", fields: np.ndarray) -> np.ndarray:
+    """Regrid a stack of flattened fields (k x src cells) -> (k x dst cells)."""
+    x = fields.T
+    valid = np.isfinite(x)
+    num = w @ np.where(valid, x, 0.0)
+    den = w @ valid.astype(x.dtype)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = np.where(den >= MIN_WEIGHT, num / den, np.nan)
+    return out.T
+
+
+def regrid(ds: xr.Dataset) -> xr.Dataset:
+    """Bilinearly regrid every (lat, lon) variable of `ds` onto the analysis grid."""
+    lat_dim, lon_dim = _spatial_dims(ds)
+    w = get_weights(ds[lat_dim].values, ds[lon_dim].values)
+    dst_lat, dst_lon = analysis_grid()
+    out = {}
+    for name, da in ds.data_vars.items():
+        if lat_dim not in da.dims or lon_dim not in da.dims:
+            continue
+        da = da.transpose(..., lat_dim, lon_dim)
+        lead = da.shape[:-2]
+        values = np.asarray(da.values, dtype=np.result_type(da.dtype, np.float32))
+        fields = _apply(w, values.reshape(-1, values.shape[-2] * values.shape[-1]))
+        out[name] = xr.DataArray(
+            fields.reshape(*lead, dst_lat.size, dst_lon.size),
+            dims=(*da.dims[:-2], "lat", "lon"),
+            attrs=da.attrs,
+        )
+    coords = {d: ds[d] for d in ds.dims if d not in (lat_dim, lon_dim) and d in ds.coords}
+    return xr.Dataset(out, coords={**coords, "lat": dst_lat, "lon": dst_lon}, attrs=ds.attrs)
+
+
+def analysis_name(source: str) -> str:
+    return f"analysis_{source}"
+
+
+def append_analysis(source: str, ds: xr.Dataset) -> int:
+    """Regrid one new granule/run of `source` and append it along time to its analysis
+    store. Variables are prefixed with the source so the stores merge into one cube.
+    Returns the number of regridded values (0 when regridding is disabled or unsupported).
+    """
+    if not settings.analysis_grid_bbox:
+        return 0
+    if sparse is None:
+        logger.warning("scipy not installed; skipping %s analysis regrid", source)
+        return 0
+    try:
+        _spatial_dims(ds)
+    except ValueError as e:
+        logger.warning("Skipping %s analysis regrid: %s", source, e)
+        return 0
+    if "time" in ds.coords and "time" not in ds.dims:
+        ds = ds.expand_dims("time")
+    if "time" in ds.dims:
+        # Fields without a time axis (a single model run) belong to every step
+        ds = ds.map(lambda v: v if "time" in v.dims else v.expand_dims(time=ds["time"].values))
+    steps = [ds.isel(time=[i]) for i in range(ds.sizes["time"])] if "time" in ds.dims else [ds]
+    target = get_zarr_target(analysis_name(source), partitioned=False)
+    total = 0
+    # One time step at a time keeps memory to a single field per variable
+    for step in steps:
+        out = regrid(step)
+        if not out.data_vars:
+            continue
+        out = out.rename({v: f"{source}_{v}" for v in out.data_vars})
+        if "time" in out.dims and zarr_exists(target):
+            out.to_zarr(target, mode="a", append_dim="time")
+        else:
+            encoding = {"time": {"units": TIME_UNITS, "dtype": "int64"}} if "time" in out.coords else None
+            out.to_zarr(target, mode="w", encoding=encoding)
+        total += sum(int(v.size) for v in out.data_vars.values())
+    return total
+
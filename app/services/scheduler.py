@@ -0,0 +1,214 @@
+from __future__ import annotations
+import asyncio
+import logging
+import os
+import random
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import SQLModel, Field
+from config import settings
+from db import get_session
+from services.jobs import QUEUED, RUNNING, enqueue, get_job
+
+logger = logging.getLogger(__name__)
+
+LEASE_NAME = "ingest-scheduler"
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _aware(dt: Optional[datetime]) -> Optional[datetime]:
+    if dt is not None and dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+def _window(hours: int) -> Callable[[datetime], str]:
+    # Rolling time range ending at the current hour; hour-aligned so repeated
+    # searches hit the CMR cache
+    def _range(now: datetime) -> str:
+        end = now.replace(minute=0, second=0, microsecond=0)
+        start = end - timedelta(hours=hours)
+        return f"{start.strftime('%Y-%m-%dT%H:%M:%SZ')},{end.strftime('%Y-%m-%dT%H:%M:%SZ')}"
+    return _range
+
+
+# name -> (job source, fixed params, params computed at enqueue time)
+PRESETS: Dict[str, Tuple[str, Dict[str, Any], Dict[str, Callable[[datetime], Any]]]] = {
+    "openaq": ("openaq", {"country": None, "parameter": None, "limit": 1000}, {}),
+    "airnow": (
+        "airnow",
+        {"bbox": "-125,24,-66,50", "start_date": None, "end_date": None, "parameter": None, "limit": 1000, "tile_deg": 10.0},
+        {},
+    ),
+    "tempo_nrt": ("tempo", {"product": None, "version": None, "nrt": True}, {"time_range": _window(6)}),
+    "imerg_early": ("imerg", {"product": "GPM_3IMERGHH_E"}, {"time_range": _window(6)}),
+    "merra2": ("merra2", {"product": None}, {"time_range": _window(72)}),
+}
+
+
+class SchedulerLease(SQLModel, table=True):
+    name: str = Field(primary_key=True)
+    holder: str
+    expires_at: datetime
+
+
+class ScheduleState(SQLModel, table=True):
+    name: str = Field(primary_key=True)
+    next_run_at: Optional[datetime] = Field(default=None)
+    last_enqueued_at: Optional[datetime] = Field(default=None)
+    last_job_id: Optional[int] = Field(default=None)
+
+
+def parse_interval(text: str) -> timedelta:
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    text = text.strip().lower()
+    if not text or text[-1] not in units:
+        raise ValueError(f"Invalid interval: {text!r} (use e.g. 30s, 15m, 1h, 1d)")
+    return timedelta(seconds=float(text[:-1]) * units[text[-1]])
+
+
+def parse_schedule(spec: str) -> Dict[str, timedelta]:
+    out: Dict[str, timedelta] = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, interval = part.partition("=")
+        name = name.strip()
+        if name not in PRESETS:
+            raise ValueError(f"Unknown scheduled ingest: {name}")
+        out[name] = parse_interval(interval)
+    return out
+
+
+def next_run(now: datetime, interval: timedelta, jitter: float) -> datetime:
+    """Next interval boundary after `now` (like cron */N) plus random jitter."""
+    step = interval.total_seconds()
+    boundary = (now.timestamp() // step + 1) * step
+    return datetime.fromtimestamp(boundary + random.uniform(0, jitter), tz=timezone.utc)
+
+
+def acquire_lease(holder: str, ttl_seconds: int) -> bool:
+    """Take or renew the scheduler lease; only one process across workers holds it."""
+    now = _utcnow()
+    expires = now + timedelta(seconds=ttl_seconds)
+    with get_session() as s:
+        if s.get(SchedulerLease, LEASE_NAME) is None:
+            try:
+                s.add(SchedulerLease(name=LEASE_NAME, holder=holder, expires_at=expires))
+                s.commit()
+                return True
+            except IntegrityError:
+                s.rollback()
+        res = s.execute(
+            update(SchedulerLease)
+            .where(
+                SchedulerLease.name == LEASE_NAME,
+                (SchedulerLease.holder == holder) | (SchedulerLease.expires_at < now),
+            )
+            .values(holder=holder, expires_at=expires)
+        )
+        s.commit()
+        return res.rowcount == 1
+
+
+def release_lease(holder: str) -> None:
+    with get_session() as s:
+        s.execute(
+            update(SchedulerLease)
+            .where(SchedulerLease.name == LEASE_NAME, SchedulerLease.holder == holder)
+            .values(expires_at=_utcnow())
+        )
+        s.commit()
+
+
+def _load_state(name: str) -> ScheduleState:
+    with get_session() as s:
+        return s.get(ScheduleState, name) or ScheduleState(name=name)
+
+
+def _save_state(state: ScheduleState) -> None:
+    with get_session() as s:
+        s.merge(state)
+        s.commit()
+
+
+def run_due(schedule: Dict[str, timedelta], now: Optional[datetime] = None) -> List[int]:
+    """Enqueue every scheduled ingest whose next run is due. An entry whose previous
+    job is still queued or running is skipped so runs never overlap.
+    """
+    now = now or _utcnow()
+    jitter = settings.ingest_schedule_jitter_seconds
+    enqueued: List[int] = []
+    for name, interval in schedule.items():
+        state = _load_state(name)
+        if state.next_run_at is None:
+            state.next_run_at = next_run(now, interval, jitter)
+            _save_state(state)
+            continue
+        if _aware(state.next_run_at) > now:
+            continue
+        state.next_run_at = next_run(now, interval, jitter)
+        previous = get_job(state.last_job_id) if state.last_job_id else None
+        if previous is not None and previous.status in (QUEUED, RUNNING):
+            logger.info("Skipping scheduled %s: job %s still %s", name, previous.id, previous.status)
+            _save_state(state)
+            continue
+        source, params, dynamic = PRESETS[name]
+        params = {**params, **{k: fn(now) for k, fn in dynamic.items()}}
+        job, _ = enqueue(source, params)
+        state.last_job_id = job.id
+        state.last_enqueued_at = now
+        _save_state(state)
+        enqueued.append(job.id)
+    return enqueued
+
+
+class IngestScheduler:
+    """Periodically enqueues configured ingests. Every API/worker process may run one;
+    the DB lease makes exactly one of them the leader at a time."""
+
+    def __init__(self, schedule: Optional[Dict[str, timedelta]] = None) -> None:
+        self.schedule = schedule if schedule is not None else parse_schedule(settings.ingest_schedule)
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._task: Optional[asyncio.Task] = None
+
+    async def run(self) -> None:
+        ttl = max(10, settings.scheduler_lease_seconds)
+        tick = ttl / 3
+        # Spread out processes that start together
+        await asyncio.sleep(random.uniform(0, tick))
+        leader = False
+        try:
+            while True:
+                try:
+                    leader = await asyncio.to_thread(acquire_lease, self.holder, ttl)
+                    if leader:
+                        await asyncio.to_thread(run_due, self.schedule)
+                except Exception:
+                    logger.exception("Ingest scheduler tick failed")
+                await asyncio.sleep(tick)
+        finally:
+            if leader:
+                await asyncio.to_thread(release_lease, self.holder)
+
+    def start(self) -> None:
+        if not self.schedule or self._task is not None:
+            return
+        self._task = asyncio.get_event_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
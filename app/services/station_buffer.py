@@ -0,0 +1,184 @@
+from __future__ import annotations
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+
+from config import settings
+from services.features import nearest_station
+from services.model_registry import registry
+from services.storage import ensure_dir, store_lock
+
+BUFFER_NAME = "station_buffer.npz"
+
+
+class StationBuffer:
+    """Last `capacity` observations of every station (location/parameter pair) in
+    fixed-size arrays. Row r of `values` is a ring buffer: `head[r]` is the next
+    slot to write and `count[r]` how many slots hold data."""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.n = 0
+        self.keys = np.empty(0, dtype=object)
+        self.parameter = np.empty(0, dtype=object)
+        self.lat = np.empty(0)
+        self.lon = np.empty(0)
+        self.values = np.empty((0, capacity), dtype=np.float32)
+        self.last_time = np.empty(0, dtype=np.int64)
+        self.head = np.empty(0, dtype=np.int32)
+        self.count = np.empty(0, dtype=np.int32)
+        self._index: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _grow(self, rows: int) -> None:
+        size = max(rows, 2 * len(self.keys), 64)
+        pad = size - len(self.keys)
+        self.keys = np.concatenate([self.keys, np.empty(pad, dtype=object)])
+        self.parameter = np.concatenate([self.parameter, np.empty(pad, dtype=object)])
+        self.lat = np.concatenate([self.lat, np.full(pad, np.nan)])
+        self.lon = np.concatenate([self.lon, np.full(pad, np.nan)])
+        self.values = np.concatenate([self.values, np.full((pad, self.capacity), np.nan, dtype=np.float32)])
+        self.last_time = np.concatenate([self.last_time, np.full(pad, np.iinfo(np.int64).min)])
+        self.head = np.concatenate([self.head, np.zeros(pad, dtype=np.int32)])
+        self.count = np.concatenate([self.count, np.zeros(pad, dtype=np.int32)])
+
+    def _row(self, key: str, parameter: str) -> int:
+        r = self._index.get(key)
+        if r is None:
+            if self.n == len(self.keys):
+                self._grow(self.n + 1)
+            r = self.n
+            self.n += 1
+            self.keys[r] = key
+            self.parameter[r] = parameter
+            self._index[key] = r
+        return r
+
+    def update(self, location: np.ndarray, parameter: np.ndarray, times: np.ndarray, values: np.ndarray,
+               lat: np.ndarray, lon: np.ndarray) -> int:
+        """Append observations (any order); only those newer than a station's last
+        one are kept. Returns the number appended."""
+        t = times.astype("datetime64[s]").astype("int64")
+        ok = np.isfinite(values) & np.isfinite(lat) & np.isfinite(lon)
+        location, parameter, t, values, lat, lon = (a[ok] for a in (location, parameter, t, values, lat, lon))
+        order = np.lexsort((t, parameter, location))
+        location, parameter, t, values, lat, lon = (a[order] for a in (location, parameter, t, values, lat, lon))
+        new_station = np.ones(t.size, dtype=bool)
+        new_station[1:] = (location[1:] != location[:-1]) | (parameter[1:] != parameter[:-1])
+        bounds = np.append(np.flatnonzero(new_station), t.size)
+        added = 0
+        cap = self.capacity
+        with self._lock:
+            for a, b in zip(bounds[:-1], bounds[1:]):
+                r = self._row(f"{location[a]}|{parameter[a]}", str(parameter[a]))
+                tt, first = np.unique(t[a:b], return_index=True)
+                keep = tt > self.last_time[r]
+                tt, vv = tt[keep][-cap:], values[a:b][first][keep][-cap:]
+                k = tt.size
+                if k == 0:
+                    continue
+                pos = (self.head[r] + np.arange(k)) % cap
+                self.values[r, pos] = vv
+                self.head[r] = (self.head[r] + k) % cap
+                self.count[r] = min(int(self.count[r]) + k, cap)
+                self.last_time[r] = tt[-1]
+                self.lat[r], self.lon[r] = lat[b - 1], lon[b - 1]
+                added += k
+        return added
+
+    def window(self, row: int, length: int) -> np.ndarray:
+        """Up to `length` most recent values of one station, oldest first."""
+        with self._lock:
+            k = min(length, int(self.count[row]))
+            idx = (self.head[row] - k + np.arange(k)) % self.capacity
+            return self.values[row, idx].copy()
+
+    def nearest(self, lat: float, lon: float, parameter: Optional[str], max_km: float) -> int:
+        """Row of the nearest station with data (and `parameter`, if given); -1 if none."""
+        with self._lock:
+            rows = np.flatnonzero(self.count[: self.n] > 0)
+            if parameter is not None:
+                rows = rows[self.parameter[rows] == parameter]
+            if rows.size == 0:
+                return -1
+            i = int(nearest_station(np.array([lat]), np.array([lon]), self.lat[rows], self.lon[rows], max_km)[0])
+            return int(rows[i]) if i >= 0 else -1
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            n = self.n
+            np.savez(
+                path,
+                capacity=self.capacity,
+                keys=self.keys[:n].astype(str),
+                parameter=self.parameter[:n].astype(str),
+                lat=self.lat[:n],
+                lon=self.lon[:n],
+                values=self.values[:n],
+                last_time=self.last_time[:n],
+                head=self.head[:n],
+                count=self.count[:n],
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "StationBuffer":
+        with np.load(path) as z:
+            buf = cls(int(z["capacity"]))
+            buf.n = len(z["keys"])
+            buf.keys = z["keys"].astype(object)
+            buf.parameter = z["parameter"].astype(object)
+            buf.lat, buf.lon = z["lat"], z["lon"]
+            buf.values = z["values"]
+            buf.last_time, buf.head, buf.count = z["last_time"], z["head"], z["count"]
+        buf._index = {k: i for i, k in enumerate(buf.keys)}
+        return buf
+
+
+def _buffer_path() -> Path:
+    ensure_dir(settings.data_dir)
+    return Path(settings.data_dir) / BUFFER_NAME
+
+
+def get_buffer() -> Optional[StationBuffer]:
+    """The snapshot written by the last ingest, reloaded when it changes on disk."""
+    return registry.get(str(_buffer_path()), StationBuffer.load)
+
+
+def update_station_buffer(obs: pd.DataFrame, station_col: str = "location") -> int:
+    """Ingestion hook: push new observations (datetime/latitude/longitude/parameter/value)
+    into the rolling buffer and write a new snapshot. Call it once per ingest run with
+    everything the run wrote; each call rewrites the whole snapshot."""
+    if obs.empty:
+        return 0
+    path = _buffer_path()
+    # The API and the worker both ingest, so this is a cross-process lock
+    with store_lock("station_buffer"):
+        # Merge into the snapshot on disk, which another process may have just
+        # replaced, rather than into this process's cached copy
+        buf = StationBuffer.load(str(path)) if path.exists() else StationBuffer(settings.station_buffer_size)
+        added = buf.update(
+            (obs[station_col].astype(str) if station_col in obs else pd.Series("", index=obs.index)).to_numpy(dtype=str),
+            obs["parameter"].astype(str).to_numpy(dtype=str),
+            pd.to_datetime(obs["datetime"], utc=True).dt.tz_localize(None).to_numpy(),
+            pd.to_numeric(obs["value"], errors="coerce").to_numpy(dtype=float),
+            obs["latitude"].astype(float).to_numpy(),
+            obs["longitude"].astype(float).to_numpy(),
+        )
+        if added:
+            registry.publish(str(path), buf, buf.save)
+        return added
+
+
+def recent_window(lat: float, lon: float, length: int, parameter: Optional[str] = None) -> Optional[np.ndarray]:
+    """The last `length` observations of the nearest station, oldest first and padded at
+    the front with its oldest value when it has fewer; None when no station is near."""
+    buf = get_buffer()
+    if buf is None:
+        return None
+    r = buf.nearest(lat, lon, parameter, settings.station_buffer_max_km)
+    if r < 0:
+        return None
+    w = buf.window(r, length)
+    return np.pad(w, (length - w.size, 0), mode="edge") if w.size < length else w
@@ -1,10 +1,22 @@
 from __future__ import annotations
+from contextlib import contextmanager
 from pathlib import Path
 import os
-from typing import Any
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
 from config import settings
 
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Fine-grained time encoding pinned on stores that are appended along time
+TIME_UNITS = "seconds since 1970-01-01T00:00:00"
+
 
 def ensure_dir(path: Path) -> None:
     path.mkdir(parents=True, exist_ok=True)
@@ -28,6 +40,112 @@ def get_zarr_target(name: str, partitioned: bool = False, dt: datetime | None =
     return str(target.resolve())
 
 
+PREDICTION_STORE = "predictions"
+
+
+def prediction_target(zarr_path: str) -> str:
+    """Sidecar store for predictions over a store from get_zarr_target: the same relative
+    path under PREDICTION_STORE, so ingest appends never see the prediction variable."""
+    if zarr_path.startswith("s3://"):
+        root = f"s3://{settings.s3_bucket}/zarr/"
+        return f"{root}{PREDICTION_STORE}/{zarr_path[len(root):]}"
+    root = (settings.data_dir / "zarr").resolve()
+    target = root / PREDICTION_STORE / Path(zarr_path).resolve().relative_to(root)
+    ensure_dir(target.parent)
+    return str(target)
+
+
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def store_lock(name: str) -> Iterator[None]:
+    """Hold the write lock of store `name` (all its partitions).
+
+    Zarr appends are not safe against concurrent writers, and jobs run in the worker
+    while the API may ingest too, so this is a lock file shared by every process on
+    the host as well as a lock between threads. Read-modify-write steps around the
+    append (dedupe keys, merged snapshots) belong inside it too.
+    """
+    with _thread_locks_guard:
+        lock = _thread_locks.setdefault(name, threading.Lock())
+    with lock:
+        if fcntl is None:
+            yield
+            return
+        lock_dir = Path(settings.data_dir) / "locks"
+        ensure_dir(lock_dir)
+        with open(lock_dir / f"{name}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def zarr_exists(target: str) -> bool:
+    if target.startswith("s3://"):
+        import fsspec
+        return fsspec.filesystem("s3").exists(target)
+    return Path(target).exists()
+
+
+def list_partitions(name: str) -> List[str]:
+    """Day partitions of `name`, oldest first."""
+    pattern = "year=*/month=*/day=*.zarr"
+    if settings.zarr_store == "s3":
+        import fsspec
+        found = fsspec.filesystem("s3").glob(f"{settings.s3_bucket}/zarr/{name}/{pattern}")
+        return sorted(f"s3://{p}" for p in found)
+    root = settings.data_dir / "zarr" / name
+    return sorted(str(p.resolve()) for p in root.glob(pattern))
+
+
+def string_values(values: pd.Series) -> np.ndarray:
+    """Object array for a string variable: Zarr v3 stores those variable-length, so a
+    later append to the same partition can carry longer names than the first write."""
+    return values.astype(str).to_numpy(dtype=object)
+
+
+def time_values(values: pd.Series) -> np.ndarray:
+    """Timestamps as naive UTC datetime64; tz-aware ones reach Zarr as Python objects."""
+    return pd.to_datetime(values, utc=True).dt.tz_localize(None).to_numpy()
+
+
+def time_encoding(ds: Any) -> Dict[str, dict] | None:
+    """Encoding for the first write of a store that is appended to later: appends reuse
+    the time units, so they must not be inferred from the first batch alone."""
+    return {"time": {"units": TIME_UNITS, "dtype": "int64"}} if "time" in ds.variables else None
+
+
+def partition_groups(df: pd.DataFrame, time_col: str = "datetime") -> Iterator[Tuple[datetime, np.ndarray]]:
+    """Yield (day, row positions) for every UTC day present in `df[time_col]`."""
+    days = pd.to_datetime(df[time_col], utc=True).dt.floor("D")
+    for day, idx in days.groupby(days, sort=True).indices.items():
+        yield pd.Timestamp(day).to_pydatetime(), idx
+
+
+def write_partitioned(
+    df: pd.DataFrame, name: str, to_dataset: Callable[[pd.DataFrame], Any], time_col: str = "datetime"
+) -> Dict[str, int]:
+    """Write each row of `df` to the day partition of `name` its timestamp falls in,
+    appending along `obs` when the partition already exists. Returns rows per target.
+    """
+    written: Dict[str, int] = {}
+    if df.empty:
+        return written
+    for day, idx in partition_groups(df, time_col):
+        target = get_zarr_target(name, partitioned=True, dt=day)
+        ds = to_dataset(df.iloc[idx])
+        if zarr_exists(target):
+            ds.to_zarr(target, mode="a", append_dim="obs")
+        else:
+            ds.to_zarr(target, mode="w", encoding=time_encoding(ds))
+        written[target] = len(idx)
+    return written
+
+
 def get_model_path(name: str) -> Path:
     ensure_dir(settings.model_dir)
     return (settings.model_dir / name).resolve()
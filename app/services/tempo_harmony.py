@@ -1,10 +1,17 @@
 from __future__ import annotations
-from typing import Optional
+import asyncio
+import shutil
+from functools import reduce
+from typing import List, Optional
 from pathlib import Path
 import tempfile
 import xarray as xr
 
-from services.harmony_subset import subset_harmony
+from config import settings
+from services.earthdata import chunk_spec
+from services.harmony_subset import ClientFactory, subset_harmony_tiled
+from services.jobs import report_progress
+from services.regrid import append_analysis
 from services.storage import get_zarr_target, ensure_dir
 
 
@@ -25,32 +32,76 @@ def _select_tempo_variable(ds: xr.Dataset) -> str:
     return list(ds.data_vars.keys())[0]
 
 
+def _slim(ds: xr.Dataset) -> xr.Dataset:
+    var = _select_tempo_variable(ds)
+    return ds[[var]].rename({var: "no2"})
+
+
 async def ingest_tempo_harmony(
     collection: Optional[str] = None,
     bbox: Optional[str] = None,
     time_range: Optional[str] = None,
-    zarr_name: str = "tempo_latest",
+    zarr_name: str = "tempo_harmony_latest",
+    tile_deg: Optional[float] = None,
+    time_step_hours: Optional[float] = None,
+    client_factory: Optional[ClientFactory] = None,
 ) -> int:
     coll = collection or "TEMPO_NO2_L3"
-    # Download a subset NetCDF using Harmony
-    tmpdir = Path(tempfile.gettempdir()) / "tempo_harmony"
-    ensure_dir(tmpdir)
-    nc_path = str((tmpdir / "tempo_subset.nc").resolve())
-    res = subset_harmony(collection=coll, bbox=bbox, time_range=time_range, output=nc_path)
-    if not res or res.get("downloaded", 0) == 0:
-        return 0
-    ds = xr.open_dataset(nc_path, engine="netcdf4")
-    var = _select_tempo_variable(ds)
-    slim = ds[[var]].rename({var: "no2"})
-    # Attach simple provenance
-    slim.attrs["source"] = "TEMPO"
-    slim.attrs["collection"] = coll
-    if bbox:
-        slim.attrs["bbox"] = bbox
-    if time_range:
-        slim.attrs["time_range"] = time_range
-    target = get_zarr_target(zarr_name, partitioned=False)
-    slim.to_zarr(target, mode="w")
-    return int(slim["no2"].size)
+    # Each run downloads into its own directory so concurrent jobs never share files
+    tmproot = Path(tempfile.gettempdir()) / "tempo_harmony"
+    ensure_dir(tmproot)
+    workdir = Path(tempfile.mkdtemp(prefix="subset_", dir=tmproot))
+    try:
+        files = await subset_harmony_tiled(
+            collection=coll,
+            bbox=bbox,
+            time_range=time_range,
+            workdir=workdir,
+            tile_deg=tile_deg,
+            time_step_hours=time_step_hours,
+            client_factory=client_factory,
+        )
+        if not files:
+            return 0
+        await asyncio.to_thread(report_progress, files=len(files))
+        return await asyncio.to_thread(_merge_and_write, files, coll, bbox, time_range, zarr_name)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
 
 
+def _mosaic(parts: List[xr.DataArray]) -> xr.DataArray:
+    """Place tiles on the union of their coordinates. Tiles abut and may share edge
+    rows/columns, so each cell keeps the first non-missing value written to it.
+
+    Tiles are dask-backed, so this only builds a graph; nothing is loaded until
+    the mosaic is written.
+    """
+    dims = parts[0].dims
+    out = reduce(lambda a, b: a.combine_first(b), [p.transpose(*dims) for p in parts])
+    out.attrs = parts[0].attrs
+    return out
+
+
+def _merge_and_write(
+    files: List[str], coll: str, bbox: Optional[str], time_range: Optional[str], zarr_name: str
+) -> int:
+    opened = [xr.open_dataset(f, engine="netcdf4", chunks={}) for f in files]
+    try:
+        slim = _mosaic([_slim(ds)["no2"] for ds in opened]).to_dataset(name="no2")
+        # Attach simple provenance
+        slim.attrs["source"] = "TEMPO"
+        slim.attrs["collection"] = coll
+        if bbox:
+            slim.attrs["bbox"] = bbox
+        if time_range:
+            slim.attrs["time_range"] = time_range
+        slim = slim.chunk(chunk_spec(slim, settings.zarr_spatial_chunk))
+        # Each run replaces its own store; the granule-ledger `tempo_latest` store
+        # that Earthdata ingests append to is left alone
+        target = get_zarr_target(zarr_name, partitioned=False)
+        slim.to_zarr(target, mode="w")
+        append_analysis("tempo", slim)
+        return int(slim["no2"].size)
+    finally:
+        for ds in opened:
+            ds.close()
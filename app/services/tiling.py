@@ -0,0 +1,57 @@
+from __future__ import annotations
+import math
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+
+def parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    parts = [float(p) for p in bbox.split(",")]
+    if len(parts) != 4:
+        raise ValueError("bbox must be minLon,minLat,maxLon,maxLat")
+    min_lon, min_lat, max_lon, max_lat = parts
+    if min_lon >= max_lon or min_lat >= max_lat:
+        raise ValueError("bbox min must be smaller than max")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+def split_bbox(bbox: str, tile_deg: float) -> List[str]:
+    """Split a bbox string into a grid of tiles of at most `tile_deg` degrees per side."""
+    if tile_deg <= 0:
+        raise ValueError("tile_deg must be positive")
+    min_lon, min_lat, max_lon, max_lat = parse_bbox(bbox)
+    nx = max(1, math.ceil((max_lon - min_lon) / tile_deg))
+    ny = max(1, math.ceil((max_lat - min_lat) / tile_deg))
+    dx = (max_lon - min_lon) / nx
+    dy = (max_lat - min_lat) / ny
+    tiles = []
+    for j in range(ny):
+        for i in range(nx):
+            x0 = min_lon + i * dx
+            y0 = min_lat + j * dy
+            x1 = max_lon if i == nx - 1 else x0 + dx
+            y1 = max_lat if j == ny - 1 else y0 + dy
+            tiles.append(f"{x0:.6f},{y0:.6f},{x1:.6f},{y1:.6f}")
+    return tiles
+
+
+def _parse_time(text: str) -> datetime:
+    dt = datetime.fromisoformat(text.strip().replace("Z", "+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def split_time_range(time_range: Optional[str], step_hours: float) -> List[Optional[str]]:
+    """Split an ISO "start,end" range into consecutive windows of at most `step_hours`."""
+    if not time_range or step_hours <= 0:
+        return [time_range]
+    start_s, _, end_s = time_range.partition(",")
+    start, end = _parse_time(start_s), _parse_time(end_s)
+    if start >= end:
+        raise ValueError("time_range start must be before end")
+    step = timedelta(hours=step_hours)
+    windows = []
+    t = start
+    while t < end:
+        t1 = min(t + step, end)
+        windows.append(f"{t.strftime('%Y-%m-%dT%H:%M:%SZ')},{t1.strftime('%Y-%m-%dT%H:%M:%SZ')}")
+        t = t1
+    return windows
@@ -0,0 +1,71 @@
+from __future__ import annotations
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from config import settings
+from services.jobs import bind_job, current_job_id
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: the API process runs threads (job pool, scheduler) that must not be
+            # forked; one task per child returns TensorFlow/XGBoost memory after each run
+            _pool = ProcessPoolExecutor(
+                max_workers=max(1, settings.train_workers),
+                mp_context=multiprocessing.get_context("spawn"),
+                max_tasks_per_child=1,
+            )
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _run(kind: str, job_id: Optional[int], params: Dict[str, Any]) -> dict:
+    """Entry point in the training process; progress is written to the job row."""
+    bind_job(job_id)
+    from services.storage import get_zarr_target
+    if kind == "xgb":
+        from services.features import FEATURE_STORE
+        from services.model_xgb import train_from_features, train_from_zarr
+        zarr_name = params.get("zarr_name", FEATURE_STORE)
+        promote = params.get("promote", "auto")
+        if zarr_name == FEATURE_STORE:
+            return train_from_features(params.get("days"), promote=promote)
+        return train_from_zarr(get_zarr_target(zarr_name), promote=promote)
+    if kind == "lstm":
+        from services.model_lstm import train_lstm_from_zarr
+        return train_lstm_from_zarr(
+            get_zarr_target(params.get("zarr_name", "openaq_latest")),
+            window=int(params.get("window", 24)),
+            horizon=int(params.get("horizon", 24)),
+            epochs=int(params.get("epochs", 5)),
+            promote=params.get("promote", "auto"),
+        )
+    raise ValueError(f"Unknown training kind: {kind}")
+
+
+async def _submit(kind: str, params: Dict[str, Any]) -> dict:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_pool(), _run, kind, current_job_id(), params)
+
+
+async def train_xgb_job(**params: Any) -> dict:
+    return await _submit("xgb", params)
+
+
+async def train_lstm_job(**params: Any) -> dict:
+    return await _submit("lstm", params)
@@ -0,0 +1,110 @@
+from __future__ import annotations
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Tuple
+import numpy as np
+
+try:
+    import treelite
+    import tl2cgen
+except Exception:  # pragma: no cover
+    treelite = None
+    tl2cgen = None
+
+try:
+    import onnxruntime as ort
+    from onnxmltools import convert_xgboost
+    from onnxmltools.convert.common.data_types import FloatTensorType
+except Exception:  # pragma: no cover
+    ort = None
+
+from config import settings
+from services.storage import get_model_path
+
+logger = logging.getLogger(__name__)
+
+# sklearn: XGBRegressor.predict (DMatrix per call; the reference path)
+# inplace: Booster.inplace_predict straight from the numpy array
+# treelite: booster compiled to a shared library with tl2cgen (needs a C compiler once)
+# onnx: booster converted to ONNX and run with onnxruntime
+BACKENDS = ("sklearn", "inplace", "treelite", "onnx")
+
+Predict = Callable[[np.ndarray], np.ndarray]
+
+_lock = threading.Lock()
+# backend name -> (model object it was built for, predict function)
+_cache: Dict[str, Tuple[object, Predict]] = {}
+
+
+def _sklearn(model) -> Predict:
+    return lambda X: np.asarray(model.predict(X), dtype=float)
+
+
+def _inplace(model) -> Predict:
+    # Own copy on one thread: for a few rows, waking the OpenMP pool costs more than
+    # the trees (batch scoring parallelizes over chunks instead)
+    booster = model.get_booster().copy()
+    booster.set_param({"nthread": 1})
+    return lambda X: np.asarray(booster.inplace_predict(X, validate_features=False), dtype=float)
+
+
+def _treelite(model) -> Predict:
+    if treelite is None:
+        raise RuntimeError("treelite/tl2cgen not installed")
+    booster = model.get_booster()
+    # One library per booster content, reused across restarts and processes
+    digest = hashlib.sha1(bytes(booster.save_raw("ubj"))).hexdigest()[:16]
+    libpath = get_model_path(f"xgb_aqi.{digest}.so")
+    if not libpath.exists():
+        tmp = libpath.with_name(f".{libpath.name}.tmp.so")
+        tl2cgen.export_lib(treelite.frontend.from_xgboost(booster), toolchain="gcc", libpath=str(tmp))
+        tmp.replace(libpath)
+    predictor = tl2cgen.Predictor(str(libpath), nthread=1)
+    return lambda X: predictor.predict(tl2cgen.DMatrix(np.asarray(X, dtype=np.float32))).reshape(-1).astype(float)
+
+
+def _onnx(model) -> Predict:
+    if ort is None:
+        raise RuntimeError("onnxruntime/onnxmltools not installed")
+    n = int(model.n_features_in_)
+    onx = convert_xgboost(model, initial_types=[("input", FloatTensorType([None, n]))])
+    options = ort.SessionOptions()
+    # Requests are a handful of rows; threads cost more than they save
+    options.intra_op_num_threads = 1
+    session = ort.InferenceSession(onx.SerializeToString(), options, providers=["CPUExecutionProvider"])
+    return lambda X: session.run(None, {"input": np.asarray(X, dtype=np.float32)})[0].reshape(-1).astype(float)
+
+
+_BUILDERS: Dict[str, Callable[[object], Predict]] = {
+    "sklearn": _sklearn,
+    "inplace": _inplace,
+    "treelite": _treelite,
+    "onnx": _onnx,
+}
+
+
+def build_predictor(model, backend: str) -> Predict:
+    if backend not in _BUILDERS:
+        raise ValueError(f"Unknown XGBoost backend: {backend}; expected one of {BACKENDS}")
+    return _BUILDERS[backend](model)
+
+
+def predictor(model, backend: str | None = None) -> Predict:
+    """Predict function for `model` on the configured backend (XGB_BACKEND), built once
+    per model. A backend that cannot be built falls back to the sklearn wrapper."""
+    backend = backend or settings.xgb_backend
+    entry = _cache.get(backend)
+    if entry is not None and entry[0] is model:
+        return entry[1]
+    with _lock:
+        entry = _cache.get(backend)
+        if entry is not None and entry[0] is model:
+            return entry[1]
+        try:
+            fn = build_predictor(model, backend)
+        except Exception as e:
+            logger.warning("XGBoost backend %s unavailable (%s); using sklearn predict", backend, e)
+            fn = _sklearn(model)
+        _cache[backend] = (model, fn)
+        return fn
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Services read DATA_DIR at import time, so point it at a scratch directory first
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="aq-tests-"))
+os.environ.setdefault("MODEL_DIR", str(Path(os.environ["DATA_DIR"]) / "models"))
+os.environ.setdefault("ANALYSIS_GRID_BBOX", "")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,40 @@
+import shutil
+
+import pandas as pd
+import xarray as xr
+
+from services import openaq
+from services.features import FEATURE_STORE, LATEST_STORE, backfill_features
+from services.storage import get_zarr_target
+
+
+def test_backfill_rebuilds_feature_partition_idempotently():
+    page = openaq.normalize_df([
+        {
+            "date": {"utc": f"2024-03-05T{hour:02d}:00:00Z"},
+            "parameter": "pm25",
+            "value": float(hour),
+            "unit": "µg/m³",
+            "coordinates": {"latitude": 41.0, "longitude": -73.0},
+            "location": "Backfill Station",
+            "country": "US",
+            "city": "NY",
+        }
+        for hour in range(3)
+    ])
+    assert len(openaq._write_batch(page)) == 3
+    day = pd.Timestamp("2024-03-05", tz="UTC").to_pydatetime()
+    target = get_zarr_target(FEATURE_STORE, partitioned=True, dt=day)
+    # As if the observations predated the feature store
+    shutil.rmtree(target)
+
+    for _ in range(2):
+        backfill_features()
+        with xr.open_zarr(target) as ds:
+            assert ds.sizes["obs"] == 3
+            assert sorted(ds["value"].values) == [0.0, 1.0, 2.0]
+
+    with xr.open_zarr(get_zarr_target(LATEST_STORE)) as latest:
+        rows = latest.reset_coords().to_dataframe()
+    row = rows[rows["location"].astype(str) == "Backfill Station"]
+    assert row["value"].tolist() == [2.0]
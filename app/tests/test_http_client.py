@@ -0,0 +1,13 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from services.http_client import retry_after_seconds
+
+
+def test_retry_after_seconds_and_http_date():
+    assert retry_after_seconds("7") == 7.0
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= retry_after_seconds(later) <= 30
+    assert retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert retry_after_seconds("soon") == 0.0
+    assert retry_after_seconds(None) == 0.0
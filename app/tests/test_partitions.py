@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import xarray as xr
+
+from services import airnow, openaq
+from services.features import FEATURE_STORE
+from services.storage import get_zarr_target
+
+
+def _openaq_page(location: str, minute: int) -> pd.DataFrame:
+    return openaq.normalize_df([{
+        "date": {"utc": f"2024-03-01T10:{minute:02d}:00Z"},
+        "parameter": "pm25",
+        "value": 12.0,
+        "unit": "µg/m³",
+        "coordinates": {"latitude": 40.0, "longitude": -74.0},
+        "location": location,
+        "country": "US",
+        "city": "NY",
+    }])
+
+
+def test_openaq_second_ingest_same_day_with_longer_names():
+    assert len(openaq._write_batch(_openaq_page("A", 0))) == 1
+    assert len(openaq._write_batch(_openaq_page("Some Longer Station", 5))) == 1
+    day = pd.Timestamp("2024-03-01", tz="UTC").to_pydatetime()
+    ds = xr.open_zarr(get_zarr_target("openaq_measurements", partitioned=True, dt=day))
+    assert list(ds["location"].values) == ["A", "Some Longer Station"]
+    feats = xr.open_zarr(get_zarr_target(FEATURE_STORE, partitioned=True, dt=day))
+    assert "Some Longer Station" in list(feats["location"].values)
+
+
+def test_airnow_second_ingest_same_day_with_longer_names():
+    def page(site: str, hour: int) -> pd.DataFrame:
+        return airnow.normalize_airnow([{
+            "UTC": f"2024-03-02T{hour:02d}:00", "Latitude": 34.0, "Longitude": -118.0, "Value": 8.0,
+            "Unit": "PPB", "Parameter": "NO2", "SiteName": site,
+        }])
+
+    assert len(airnow._write_batch(page("B", 1))) == 1
+    assert len(airnow._write_batch(page("A Much Longer Site Name", 2))) == 1
+    day = pd.Timestamp("2024-03-02", tz="UTC").to_pydatetime()
+    ds = xr.open_zarr(get_zarr_target("airnow_measurements", partitioned=True, dt=day))
+    assert list(ds["location"].values) == ["B", "A Much Longer Site Name"]
+
+
+def test_concurrent_writers_same_day():
+    def page(i: int) -> pd.DataFrame:
+        df = _openaq_page(f"Station {i}", 30 + i)
+        df["datetime"] = df["datetime"] + pd.Timedelta(days=2)
+        return df
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        written = list(pool.map(lambda i: len(openaq._write_batch(page(i))), range(8)))
+    assert written == [1] * 8
+    day = pd.Timestamp("2024-03-03", tz="UTC").to_pydatetime()
+    ds = xr.open_zarr(get_zarr_target("openaq_measurements", partitioned=True, dt=day))
+    assert sorted(ds["location"].values) == sorted(f"Station {i}" for i in range(8))
+    feats = xr.open_zarr(get_zarr_target(FEATURE_STORE, partitioned=True, dt=day))
+    assert feats.sizes["obs"] == 8
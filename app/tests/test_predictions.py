@@ -0,0 +1,46 @@
+import pandas as pd
+import xarray as xr
+
+from config import settings
+from services import openaq
+from services.features import FEATURE_STORE
+from services.model_xgb import batch_predict_from_features, train_from_features
+from services.storage import get_zarr_target, prediction_target
+
+
+def _page(location: str, hours: int, minute: int) -> pd.DataFrame:
+    return openaq.normalize_df([
+        {
+            "date": {"utc": f"2024-03-10T{h:02d}:{minute:02d}:00Z"},
+            "parameter": "pm25",
+            "value": float(h),
+            "unit": "µg/m³",
+            "coordinates": {"latitude": 40.0 + h / 10, "longitude": -74.0},
+            "location": location,
+            "country": "US",
+            "city": "NY",
+        }
+        for h in range(hours)
+    ])
+
+
+def test_batch_predict_writes_sidecar_and_ingest_still_appends(monkeypatch):
+    for i in range(8):
+        openaq._write_batch(_page(f"Station {i}", 24, i))
+    train_from_features(None, promote="force")
+    monkeypatch.setattr(settings, "predict_chunk_rows", 50)
+    batch_predict_from_features(1, write=True)
+
+    day = pd.Timestamp("2024-03-10", tz="UTC").to_pydatetime()
+    features = get_zarr_target(FEATURE_STORE, partitioned=True, dt=day)
+    with xr.open_zarr(features) as ds:
+        assert "prediction" not in ds.variables
+    # A later ingest into the scored partition must still append cleanly
+    openaq._write_batch(_page("Late Station", 2, 45))
+    with xr.open_zarr(features) as ds:
+        assert ds.sizes["obs"] == 8 * 24 + 2
+
+    batch_predict_from_features(1, write=True)
+    with xr.open_zarr(prediction_target(features)) as pred:
+        assert pred.sizes["obs"] == 8 * 24 + 2
+        assert pred["prediction"].notnull().all()
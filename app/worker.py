@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""Ingestion worker. The API starts it as a child process unless JOB_WORKER_EMBEDDED=false;
+then run `python worker.py` (from app/, any number of copies) next to the API, or
+queued jobs are accepted but never run."""
+import asyncio
+import signal
+from config import settings
+from logging_config import configure_logging
+from db import init_db
+from services.jobs import JobWorkerPool
+from services.scheduler import IngestScheduler
+from services.earthdata import shutdown_pool as shutdown_convert_pool
+from services.training import shutdown_pool
+
+
+async def main() -> None:
+    pool = JobWorkerPool()
+    loop = asyncio.get_running_loop()
+    # SIGTERM (e.g. the API shutting down its embedded worker) hands running jobs back
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, pool.stop)
+    scheduler = IngestScheduler()
+    scheduler.start()
+    try:
+        await pool.run()
+    finally:
+        await scheduler.stop()
+        shutdown_pool()
+        shutdown_convert_pool()
+
+
+def run() -> None:
+    configure_logging(settings.log_level)
+    init_db()
+    asyncio.run(main())
+
+
+if __name__ == "__main__":
+    run()
@@ -54,6 +54,26 @@ export class APIClient {
     }
   }
 
+  // Get forecast timelines for many map points in one request (columnar result)
+  async getAQITimelines(locations: { lat: number; lon: number }[], hours: number = 24) {
+    try {
+      const response = await fetch(`${this.baseURL}/api/forecast/timeline/batch`, {
+        method: 'POST',
+        headers: this.getHeaders(),
+        body: JSON.stringify({ locations, hours })
+      });
+
+      if (!response.ok) {
+        throw new Error(`API Error: ${response.status}`);
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error('Failed to fetch AQI timelines:', error);
+      throw error;
+    }
+  }
+
   // Ingest real data from various sources
   async ingestData(source: 'openaq' | 'tempo' | 'imerg' | 'pandora', params?: any) {
     try {